@@ -0,0 +1,238 @@
+"""Reproducible performance benchmarks for the generator, solver, batch validator and renderer.
+
+Runs headless through SDL's dummy video driver. Every metric is a time in
+milliseconds (lower is better) summarised as mean/p50/p90/p99/max.
+
+    python benchmarks/bench.py --output results.json
+    python benchmarks/bench.py --compare baseline.json --tolerance 0.2
+
+With --compare the run exits with status 1 if any metric's median is slower
+than the baseline by more than the tolerance. Any run exits with status 1 if
+hashing a 16x16 or 25x25 puzzle takes longer than HASH_BUDGET_MS.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sudoku import canonical, core, dlx, generator, solver  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hard_puzzles.txt")
+SEED = 1234
+
+# Slowest acceptable dedup_hash() on one large board, in milliseconds
+HASH_BUDGET_MS = 50
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    if len(samples) > 1:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    else:
+        cuts = samples * 99
+    return {
+        "n": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": cuts[49],
+        "p90": cuts[89],
+        "p99": cuts[98],
+        "max": samples[-1],
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def load_corpus(path=CORPUS):
+    with open(path) as f:
+        return [solver.to_grid([int(ch) for ch in line.strip()]) for line in f if line.strip()]
+
+
+def bench_generation(results, repeat):
+    rng = random.Random(SEED)
+    for level, name in enumerate(core.DIFFICULTY_LEVELS):
+        results[f"generate_board.{name.lower()}"] = timed(lambda: generator.generate_board(level, rng), repeat)
+    # Expert boards on the larger sizes; 25x25 takes about a second each
+    results["generate_board.16x16.expert"] = timed(lambda: generator.generate_board(3, rng, base=4), repeat)
+    results["generate_board.25x25.expert"] = timed(lambda: generator.generate_board(3, rng, base=5), max(1, repeat // 5))
+
+
+def bench_hashing(results, repeat):
+    # The pool and the statistics hash every large board they see
+    rng = random.Random(SEED)
+    for base in (4, 5):
+        side = base * base
+        puzzles = [generator.generate_board(level, rng, base)[0] for level in range(len(core.DIFFICULTY_LEVELS))]
+        samples = []
+        for puzzle in puzzles * max(1, repeat // len(puzzles)):
+            start = time.perf_counter()
+            canonical.dedup_hash(puzzle)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[f"dedup_hash.{side}x{side}"] = summarize(samples)
+
+
+def over_budget(results):
+    # Names of the hashing metrics whose slowest sample broke the budget
+    return [name for name, stats in results.items()
+            if name.startswith("dedup_hash.") and stats["max"] > HASH_BUDGET_MS]
+
+
+def bench_solver(results):
+    corpus = load_corpus()
+    samples = []
+    for puzzle in corpus:
+        start = time.perf_counter()
+        solver.solve(puzzle)
+        samples.append((time.perf_counter() - start) * 1000)
+    results["solver.hard_corpus"] = summarize(samples)
+
+    samples = []
+    for puzzle in corpus:
+        start = time.perf_counter()
+        canonical.puzzle_hash(puzzle)
+        samples.append((time.perf_counter() - start) * 1000)
+    results["canonical.hard_corpus"] = summarize(samples)
+
+    samples = []
+    for puzzle in corpus:
+        start = time.perf_counter()
+        dlx.solve(puzzle)
+        samples.append((time.perf_counter() - start) * 1000)
+    results["dlx.hard_corpus"] = summarize(samples)
+
+
+def bench_batch(results, repeat):
+    # Validating 100k solved grids; skipped without numpy
+    from sudoku import batch
+    if batch.np is None:
+        return
+    rng = random.Random(SEED)
+    grids = batch.as_batch([solver.random_solution(rng) for _ in range(100)])
+    grids = batch.np.tile(grids, (1000, 1, 1))
+    results["batch.valid_grids.100k"] = timed(lambda: batch.valid_grids(grids), repeat)
+    results["batch.consistent.100k"] = timed(lambda: batch.consistent(grids, grids), repeat)
+
+
+def bench_frames(results, repeat):
+    import main
+
+    main.init(headless=True)
+    main.game_state = "playing"
+    puzzle, solution = generator.generate_board(1, random.Random(SEED))
+
+    empty = core.new_board([[0] * 9 for _ in range(9)])
+    full = core.new_board(puzzle, solution)
+    for row in range(9):
+        for col in range(9):
+            if not full.get(row, col):
+                full.place(row, col, solution[row][col])
+
+    noted = core.new_board(puzzle, solution)
+    for row in range(9):
+        for col in range(9):
+            if not noted.get(row, col):
+                noted.set_notes(row, col, solver.ALL)
+
+    cases = {"empty": empty, "full": full, "notes": noted}
+    main.selected_cell = (4, 4)
+    for name, board in cases.items():
+        main.board = board
+        main.invalidate_static()
+
+        def frame():
+            main.draw_board()
+            main.draw_ui()
+
+        frame()  # Warm the static layer and glyph cache
+        results[f"frame.playing.{name}"] = timed(frame, repeat)
+
+    main.game_state = "start_screen"
+
+    def start_frame():
+        main.screen.fill(main.colors.bg_primary)
+        main.draw_start_screen()
+
+    start_frame()
+    results["frame.start_screen"] = timed(start_frame, repeat)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'metric':32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50"], stats["p50"]
+        change = after / before - 1 if before else 0.0
+        flag = " REGRESSION" if change > tolerance else ""
+        print(f"{name:32} {before:10.3f} {after:10.3f} {change:+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown of the median (0.2 = 20%%)")
+    parser.add_argument("--repeat", type=int, default=50, help="samples per frame benchmark")
+    parser.add_argument("--generate-repeat", type=int, default=10, help="boards generated per difficulty")
+    parser.add_argument("--only", choices=["generation", "solver", "batch", "frames"], action="append",
+                        help="run only these groups (repeatable)")
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["generation", "solver", "batch", "frames"]
+    results = {}
+    if "generation" in groups:
+        bench_generation(results, args.generate_repeat)
+        bench_hashing(results, args.generate_repeat)
+    if "solver" in groups:
+        bench_solver(results)
+    if "batch" in groups:
+        bench_batch(results, args.generate_repeat)
+    if "frames" in groups:
+        bench_frames(results, args.repeat)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": SEED,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            status = 1
+    else:
+        for name, stats in results.items():
+            print(f"{name:32} p50 {stats['p50']:9.3f} ms   p90 {stats['p90']:9.3f} ms   p99 {stats['p99']:9.3f} ms")
+    for name in over_budget(results):
+        print(f"{name}: slowest hash {results[name]['max']:.3f} ms, budget {HASH_BUDGET_MS} ms OVER BUDGET")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,66 @@
+import argparse
 import pygame
 import random
 import time
-import sys
 import math
+import os
 
-# Initialize pygame
-pygame.init()
+from sudoku import core
+from sudoku.pool import PuzzlePool
+from sudoku.bank import open_bank
+from sudoku.canonical import dedup_hash
+from sudoku.profiler import FrameProfiler
+from sudoku.journal import Journal, PLACE, ERASE, NOTE, HINT, OP_RECORD, OP_UNDO, OP_REDO
+from sudoku.session import SessionStore, load_session
+from sudoku.stats import StatsStore
+from sudoku.hints import HintEngine, MISTAKE, REVEAL
+from sudoku.solver import MIN_BASE, MAX_BASE, symbol
+from sudoku.replay import Recorder, read_recording, KEY, CLICK, MOTION
 
-# Screen dimensions
+# Screen dimensions. The window, fonts and puzzle bank are only created by
+# init(), so importing this module has no side effects.
 WIDTH, HEIGHT = 600, 750
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Modern Sudoku")
+screen = None
+
+# Rendered text surfaces keyed by (font, text, color). Cleared whenever the
+# theme changes; the size cap keeps ever-changing text like the timer bounded.
+GLYPH_CACHE_LIMIT = 512
+glyph_cache = {}
+
+def render_text(font, text, color):
+    key = (font, text, color)
+    surf = glyph_cache.get(key)
+    if surf is None:
+        if len(glyph_cache) >= GLYPH_CACHE_LIMIT:
+            glyph_cache.clear()
+        surf = font.render(text, True, color)
+        glyph_cache[key] = surf
+    return surf
+
+# Pre-rendered button sprites keyed by everything that changes their look
+# (theme, size, text, toggled, hover level, scale step). Cleared with the
+# glyph cache on a theme change; a new label just adds an entry. Sprites are
+# opaque with a color key for the rounded corners, which blits several
+# times faster than per-pixel alpha.
+SPRITE_CACHE_LIMIT = 256
+SPRITE_KEY = (255, 0, 255)
+sprite_cache = {}
+
+def new_sprite(width, height):
+    sprite = pygame.Surface((width, height))
+    sprite.fill(SPRITE_KEY)
+    return sprite
+
+def cached_sprite(key, render):
+    sprite = sprite_cache.get(key)
+    if sprite is None:
+        if len(sprite_cache) >= SPRITE_CACHE_LIMIT:
+            sprite_cache.clear()
+        sprite = render()
+        # Only once drawn: text blended into an RLE surface comes out different
+        sprite.set_colorkey(SPRITE_KEY, pygame.RLEACCEL)
+        sprite_cache[key] = sprite
+    return sprite
 
 # Colors
 class Colors:
@@ -18,6 +68,9 @@ class Colors:
         self.update_theme(is_dark_mode)
     
     def update_theme(self, is_dark_mode):
+        glyph_cache.clear()
+        sprite_cache.clear()
+        self.is_dark_mode = is_dark_mode
         if is_dark_mode:
             self.bg_primary = (26, 26, 46)
             self.bg_secondary = (35, 35, 56)
@@ -31,6 +84,8 @@ class Colors:
             self.shadow = (0, 0, 0, 51)
             self.cell_given = (208, 208, 208)
             self.cell_user = (125, 157, 255)
+            self.cell_conflict = (255, 107, 107)
+            self.cell_hint = (82, 72, 40)
         else:
             self.bg_primary = (249, 249, 251)
             self.bg_secondary = (255, 255, 255)
@@ -44,88 +99,144 @@ class Colors:
             self.shadow = (0, 0, 0, 18)
             self.cell_given = (74, 85, 104)
             self.cell_user = (107, 138, 253)
+            self.cell_conflict = (229, 72, 77)
+            self.cell_hint = (255, 241, 196)
 
 # Global variables
 colors = Colors()
-clock = pygame.time.Clock()
 FPS = 60
+AMBIENT_FPS = 20  # Start screen title wave
+AMBIENT_TIMEOUT = 30  # Seconds without input before the start screen stands still
+
+# Button animations are drawn in steps: hover fades in tenths, the start
+# buttons grow in steps of STEP_SCALE
+HOVER_LEVELS = 10
+STEP_SCALE = 0.005
+
+class FrameScheduler:
+    # Runs frames at max_fps only while a UI animation is in progress. When
+    # nothing moves it blocks on the event queue until input arrives or the
+    # caller's timeout (e.g. the next timer second) expires.
+    def __init__(self, max_fps=FPS, ambient_fps=AMBIENT_FPS):
+        self.max_fps = max_fps
+        self.ambient_fps = ambient_fps
+        self.clock = pygame.time.Clock()
+    
+    def next_events(self, mode, timeout=1.0):
+        if mode == "animating":
+            self.clock.tick(self.max_fps)
+            return pygame.event.get()
+        if mode == "ambient":
+            self.clock.tick(min(self.ambient_fps, self.max_fps))
+            return pygame.event.get()
+        
+        # Idle: sleep until something happens; no timeout waits for input
+        if timeout is None:
+            event = pygame.event.wait()
+        else:
+            event = pygame.event.wait(max(1, int(timeout * 1000)))
+        # Still capped: a stream of input (e.g. pointer motion) must not run
+        # frames faster than max_fps. After a long wait this returns at once.
+        self.clock.tick(self.max_fps)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+scheduler = FrameScheduler()
+profiler = FrameProfiler()
 
-# Fonts
-font_large = pygame.font.SysFont('Arial', 36, bold=True)
-font_medium = pygame.font.SysFont('Arial', 24)
-font_small = pygame.font.SysFont('Arial', 16)
-font_title = pygame.font.SysFont('Arial', 48, bold=True)
+# Fonts. font_digit and font_note are sized to the board's cells.
+font_large = font_medium = font_small = font_title = None
+font_digit = font_note = None
+
+# Board size: BASE x BASE boxes of SIDE x SIDE cells. 9x9 by default; --base
+# picks 4x4, 16x16 or 25x25, where digits above 9 are written as letters.
+BASE = 3
+SIDE = BASE * BASE
 
 # Game state
-difficulty_levels = ["Easy", "Medium", "Hard", "Expert"]
+difficulty_levels = core.DIFFICULTY_LEVELS
 current_difficulty = 1
 is_dark_mode = False
 game_time = 0
 start_time = time.time()
 selected_cell = None
 pencil_mode = False
-hints_remaining = 3
+hints_remaining = core.HINTS_PER_GAME
 game_state = "start_screen"  # Can be "start_screen" or "playing"
+last_input_time = 0.0  # pygame.time.get_ticks() of the last input, in seconds
+
+# Puzzles and the start screen decoration draw from these; --seed (or a
+# recording) makes them repeat exactly from run to run
+rng = random.Random()
+game_seed = None
+
+# Hashes of the puzzles handed out, shared by the pool and the bank so that
+# no puzzle comes back, not even mirrored or relabeled. Unseeded runs start
+# from every puzzle dealt in earlier runs, kept in the statistics database.
+played_puzzles = set()
+
+# Ready-made puzzles per difficulty, refilled by a background worker process
+POOL_SIZE = 3
+puzzle_pool = PuzzlePool(size=POOL_SIZE, seen=played_puzzles)
+
+# Optional pre-generated puzzle bank shipped next to the game
+BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles.bank")
+puzzle_bank = None
+
+def next_puzzle(difficulty):
+    # The bank only holds 9x9 puzzles
+    if BASE == 3 and puzzle_bank is not None and puzzle_bank.count(difficulty):
+        puzzle = puzzle_bank.random(difficulty, rng, seen=played_puzzles)
+        if puzzle is not None:
+            return puzzle
+    return puzzle_pool.take(difficulty)
 
-# Sample board (in a real game, this would be generated)
-def generate_board(difficulty):
-    # This is a simplified version - a real implementation would generate valid Sudoku puzzles
-    # based on the difficulty level
-    board = [[0 for _ in range(9)] for _ in range(9)]
-    solution = [[0 for _ in range(9)] for _ in range(9)]
-    
-    # Fill solution with a valid Sudoku
-    base = 3
-    side = base * base
-    
-    # Helper function to create a valid solution
-    def pattern(r, c):
-        return (base * (r % base) + r // base + c) % side
-    
-    # Create a valid solution
-    for r in range(side):
-        for c in range(side):
-            solution[r][c] = pattern(r, c) + 1
-    
-    # Shuffle the solution for more randomness
-    def shuffle_solution():
-        # Shuffle rows within each band
-        for band in range(base):
-            rows = list(range(band * base, (band + 1) * base))
-            random.shuffle(rows)
-            solution_copy = [row[:] for row in solution]
-            for r1, r2 in enumerate(rows):
-                solution[band * base + r1] = solution_copy[r2]
-    
-    shuffle_solution()
-    
-    # Copy solution to board
-    for r in range(side):
-        for c in range(side):
-            board[r][c] = solution[r][c]
-    
-    # Remove numbers based on difficulty
-    cells_to_remove = {
-        0: 30,    # Easy
-        1: 40,    # Medium
-        2: 50,    # Hard
-        3: 60     # Expert
-    }[difficulty]
-    
-    # Randomly remove cells
-    cells = [(r, c) for r in range(side) for c in range(side)]
-    random.shuffle(cells)
-    
-    for i in range(cells_to_remove):
-        if i < len(cells):
-            r, c = cells[i]
-            board[r][c] = 0
-    
-    return board, solution
-
-board, solution = generate_board(current_difficulty)
-original_board = [[board[r][c] for c in range(9)] for r in range(9)]
-notes = [[set() for _ in range(9)] for _ in range(9)]
+# Current puzzle, filled in by new_game()
+board = None
+
+# Undo/redo history of the current game, autosaved in the background so an
+# unfinished game can be resumed from the start screen
+SAVE_DIR = os.path.join(os.path.expanduser("~"), ".modern_sudoku")
+journal = Journal()
+session_store = SessionStore(SAVE_DIR)
+saved_session = None
+
+# Logical hints are searched on a worker thread, which posts HINT_READY to
+# wake the frame loop. The hint on display is cleared by the next move.
+HINT_READY = pygame.USEREVENT
+hint_engine = HintEngine(on_ready=lambda: pygame.event.post(pygame.event.Event(HINT_READY)))
+hint_waiting = False
+hint_cells = set()
+hint_message = ""
+
+# Finished games go to a SQLite database on a writer thread, which posts
+# STATS_READY once the best and median times include the new game
+STATS_READY = pygame.USEREVENT + 1
+stats_store = StatsStore(SAVE_DIR, on_ready=lambda: pygame.event.post(pygame.event.Event(STATS_READY)))
+
+def init(headless=False):
+    # Create the window (or an off-screen surface with SDL's dummy driver),
+    # load fonts and open the puzzle bank
+    global screen, font_large, font_medium, font_small, font_title, puzzle_bank, saved_session
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Modern Sudoku")
+    
+    font_large = pygame.font.SysFont('Arial', 36, bold=True)
+    font_medium = pygame.font.SysFont('Arial', 24)
+    font_small = pygame.font.SysFont('Arial', 16)
+    font_title = pygame.font.SysFont('Arial', 48, bold=True)
+    set_board_size(BASE)
+    
+    puzzle_bank = open_bank(BANK_PATH)
+    
+    saved_session = load_session(SAVE_DIR)
+    if saved_session is not None and saved_session[0].is_solved():
+        saved_session = None
 
 # UI Components
 class Button:
@@ -139,32 +250,47 @@ class Button:
         self.hovered = False
         self.animation_progress = 0
     
+    def hover_level(self):
+        # The hover tint only shows while hovered and not toggled
+        if not self.hovered or self.toggled:
+            return 0
+        return round(min(1.0, self.animation_progress) * HOVER_LEVELS)
+    
     def draw(self):
+        key = ("button", colors.is_dark_mode, self.rect.size, self.text, self.toggled, self.hover_level())
+        screen.blit(cached_sprite(key, self.render), self.rect)
+    
+    def render(self):
+        # The button and its shadow
+        rect = pygame.Rect((0, 0), self.rect.size)
+        sprite = new_sprite(rect.width, rect.height + 2)
+        
         # Background with shadow effect
-        shadow_rect = self.rect.copy()
+        shadow_rect = rect.copy()
         shadow_rect.y += 2
-        pygame.draw.rect(screen, (*colors.shadow[:3], 128), shadow_rect, border_radius=12)
+        pygame.draw.rect(sprite, (*colors.shadow[:3], 128), shadow_rect, border_radius=12)
         
         # Main button background
         color = colors.accent if self.toggled else colors.bg_secondary
-        hover_intensity = min(1.0, self.animation_progress)
-        if self.hovered and not self.toggled:
+        hover_intensity = self.hover_level() / HOVER_LEVELS
+        if hover_intensity:
             r = colors.bg_secondary[0] + (colors.accent_light[0] - colors.bg_secondary[0]) * hover_intensity
             g = colors.bg_secondary[1] + (colors.accent_light[1] - colors.bg_secondary[1]) * hover_intensity
             b = colors.bg_secondary[2] + (colors.accent_light[2] - colors.bg_secondary[2]) * hover_intensity
             color = (r, g, b)
         
-        pygame.draw.rect(screen, color, self.rect, border_radius=12)
+        pygame.draw.rect(sprite, color, rect, border_radius=12)
         
         # Border
         border_color = colors.accent if self.toggled else colors.grid_line_light
-        pygame.draw.rect(screen, border_color, self.rect, width=1, border_radius=12)
+        pygame.draw.rect(sprite, border_color, rect, width=1, border_radius=12)
         
         # Text
         text_color = colors.bg_primary if self.toggled else colors.text_primary
-        text_surf = font_small.render(self.text, True, text_color)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+        text_surf = render_text(font_small, self.text, text_color)
+        text_rect = text_surf.get_rect(center=rect.center)
+        sprite.blit(text_surf, text_rect)
+        return sprite
     
     def update(self, mouse_pos, mouse_clicked):
         prev_hovered = self.hovered
@@ -186,6 +312,9 @@ class Button:
                 self.toggled = not self.toggled
             return self.action()
         return False
+    
+    def is_animating(self):
+        return 0.0 < self.animation_progress < 1.0
 
 class StartButton(Button):
     def __init__(self, x, y, width, height, text, difficulty, action=None):
@@ -195,34 +324,43 @@ class StartButton(Button):
         self.original_rect = self.rect.copy()
     
     def draw(self):
-        # Animated scaling effect
-        scaled_width = int(self.original_rect.width * self.scale_factor)
-        scaled_height = int(self.original_rect.height * self.scale_factor)
+        # Animated scaling effect, in steps of STEP_SCALE
+        scale = round(self.scale_factor / STEP_SCALE) * STEP_SCALE
+        scaled_width = int(self.original_rect.width * scale)
+        scaled_height = int(self.original_rect.height * scale)
         self.rect.width = scaled_width
         self.rect.height = scaled_height
         self.rect.centerx = self.original_rect.centerx
         self.rect.centery = self.original_rect.centery
         
+        key = ("start", colors.is_dark_mode, self.rect.size, self.text, self.difficulty, self.hovered)
+        screen.blit(cached_sprite(key, self.render), self.rect)
+    
+    def render(self):
+        rect = pygame.Rect((0, 0), self.rect.size)
+        sprite = new_sprite(rect.width, rect.height + 3)
+        
         # Shadow
-        shadow_rect = self.rect.copy()
+        shadow_rect = rect.copy()
         shadow_rect.y += 3
-        pygame.draw.rect(screen, (*colors.shadow[:3], 128), shadow_rect, border_radius=15)
+        pygame.draw.rect(sprite, (*colors.shadow[:3], 128), shadow_rect, border_radius=15)
         
         # Button background
         color = colors.accent if self.hovered else colors.bg_secondary
-        pygame.draw.rect(screen, color, self.rect, border_radius=15)
+        pygame.draw.rect(sprite, color, rect, border_radius=15)
         
         # Inner gradient effect
-        gradient_rect = self.rect.inflate(-10, -10)
+        gradient_rect = rect.inflate(-10, -10)
         gradient_color = colors.accent_light if self.hovered else colors.bg_primary
-        pygame.draw.rect(screen, gradient_color, gradient_rect, border_radius=12)
+        pygame.draw.rect(sprite, gradient_color, gradient_rect, border_radius=12)
         
         # Text
         text_color = colors.text_primary
         diff_text = f"{self.text} - {difficulty_levels[self.difficulty]}"
-        text_surf = font_medium.render(diff_text, True, text_color)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+        text_surf = render_text(font_medium, diff_text, text_color)
+        text_rect = text_surf.get_rect(center=rect.center)
+        sprite.blit(text_surf, text_rect)
+        return sprite
     
     def update(self, mouse_pos, mouse_clicked):
         prev_hovered = self.hovered
@@ -231,10 +369,15 @@ class StartButton(Button):
         # Animate hover
         target_scale = 1.05 if self.hovered else 1.0
         self.scale_factor += (target_scale - self.scale_factor) * 0.1
+        if abs(target_scale - self.scale_factor) < 0.001:
+            self.scale_factor = target_scale
         
         if mouse_clicked and self.hovered and self.action:
             return self.action(self.difficulty)
         return False
+    
+    def is_animating(self):
+        return self.scale_factor != (1.05 if self.hovered else 1.0)
 
 # Create UI buttons
 new_game_btn = Button(WIDTH - 140, 20, 120, 40, "New Game", action=lambda: new_game())
@@ -250,6 +393,8 @@ for i, diff in enumerate(difficulty_levels):
                 toggled=(i == current_difficulty))
     difficulty_btns.append(btn)
 
+game_btns = [new_game_btn, theme_btn, hint_btn, pencil_btn] + difficulty_btns
+
 # Start screen buttons
 start_screen_btns = []
 for i, diff in enumerate(range(4)):
@@ -258,6 +403,9 @@ for i, diff in enumerate(range(4)):
                     action=lambda d=diff: start_game_with_difficulty(d))
     start_screen_btns.append(btn)
 
+# Shown on the start screen while there is an unfinished game to resume
+resume_btn = Button(20, 20, 120, 40, "Resume", action=lambda: resume_game())
+
 # Mode toggle for start screen
 dark_mode_toggle = Button(WIDTH - 140, 20, 120, 40, "Dark Mode", 
                         action=lambda: toggle_theme(), 
@@ -265,14 +413,34 @@ dark_mode_toggle = Button(WIDTH - 140, 20, 120, 40, "Dark Mode",
 
 # Game functions
 def new_game():
-    global board, solution, original_board, notes, start_time, game_time, hints_remaining
-    board, solution = generate_board(current_difficulty)
-    original_board = [[board[r][c] for c in range(9)] for r in range(9)]
-    notes = [[set() for _ in range(9)] for _ in range(9)]
+    global board, journal, start_time, game_time, hints_remaining, saved_session
+    puzzle, solution = next_puzzle(current_difficulty)
+    stats_store.deal(dedup_hash(puzzle))
+    board = core.new_board(puzzle, solution)
+    journal = Journal()
     start_time = time.time()
     game_time = 0
-    hints_remaining = 3
+    hints_remaining = core.HINTS_PER_GAME
     hint_btn.text = f"Hints: {hints_remaining}"
+    invalidate_static()
+    clear_hint()
+    saved_session = None
+    save_checkpoint()
+
+def resume_game():
+    global board, journal, start_time, game_time, hints_remaining, current_difficulty, game_state, saved_session
+    board, journal, current_difficulty, hints_remaining, game_time = saved_session
+    saved_session = None
+    set_board_size(board.geo.base)
+    start_time = time.time() - game_time
+    hint_btn.text = f"Hints: {hints_remaining}"
+    for i, btn in enumerate(difficulty_btns):
+        btn.toggled = (i == current_difficulty)
+    invalidate_static()
+    clear_hint()
+    save_checkpoint()
+    game_state = "playing"
+    return True
 
 def toggle_theme():
     global is_dark_mode
@@ -281,6 +449,8 @@ def toggle_theme():
     theme_btn.text = "Light Mode" if is_dark_mode else "Dark Mode"
     dark_mode_toggle.text = "Light Mode" if is_dark_mode else "Dark Mode"
     dark_mode_toggle.toggled = is_dark_mode
+    invalidate_static()
+    start_screen_assets.clear()
 
 def set_difficulty(diff_index):
     global current_difficulty
@@ -305,14 +475,110 @@ def toggle_pencil_mode():
     pencil_btn.toggled = pencil_mode
 
 def use_hint():
-    global hints_remaining, board
-    if hints_remaining > 0 and selected_cell:
-        row, col = selected_cell
-        if board[row][col] == 0:
-            board[row][col] = solution[row][col]
+    # Ask for the next logical step; cached board states answer at once,
+    # otherwise the result arrives with a HINT_READY event
+    global hint_waiting
+    hint = hint_engine.request(board)
+    hint_waiting = hint is None
+    if hint is not None:
+        show_hint(hint)
+
+def show_hint(hint):
+    global hints_remaining
+    message = hint.message
+    cells = [divmod(i, SIDE) for i in hint.cells]
+    if hint.technique == REVEAL:
+        # Nothing logical left to point at: reveal a digit, preferring the
+        # selected cell, while reveals remain
+        if hints_remaining == 0:
+            message, cells = "No logical step found", []
+        else:
+            row, col = cells[0]
+            if selected_cell and not board.get(*selected_cell):
+                row, col = selected_cell
+            old_notes = board.notes_mask(row, col)
+            core.apply_hint(board, row, col)
             hints_remaining -= 1
             hint_btn.text = f"Hints: {hints_remaining}"
-            notes[row][col] = set()
+            invalidate_cell(row, col)
+            invalidate_conflicts(row, col, 0, board.get(row, col))
+            record_move(HINT, row, col, 0, old_notes)
+            message, cells = f"Revealed {symbol(board.get(row, col))} in row {row + 1}, column {col + 1}", [(row, col)]
+    elif hint.technique == MISTAKE:
+        message += " (Ctrl+Z to undo)"
+    set_hint_display(cells, message)
+
+def set_hint_display(cells, message):
+    global hint_message
+    for cell in hint_cells:
+        invalidate_cell(*cell)
+    hint_cells.clear()
+    hint_cells.update(cells)
+    for cell in hint_cells:
+        invalidate_cell(*cell)
+    hint_message = message
+
+def clear_hint():
+    global hint_waiting
+    hint_waiting = False
+    if hint_cells or hint_message:
+        set_hint_display([], "")
+
+def enter_number(num):
+    # Shared by the number pad and the keyboard
+    if selected_cell:
+        row, col = selected_cell
+        old = board.get(row, col)
+        old_notes = board.notes_mask(row, col)
+        if core.enter_number(board, row, col, num, pencil_mode):
+            invalidate_cell(row, col)
+            invalidate_conflicts(row, col, old, board.get(row, col))
+            kind = NOTE if pencil_mode else PLACE if board.get(row, col) else ERASE
+            record_move(kind, row, col, old, old_notes)
+
+def clear_selected_cell():
+    if selected_cell:
+        row, col = selected_cell
+        old = board.get(row, col)
+        old_notes = board.notes_mask(row, col)
+        if core.clear_cell(board, row, col):
+            invalidate_cell(row, col)
+            invalidate_conflicts(row, col, old, 0)
+            record_move(ERASE, row, col, old, old_notes)
+
+# Undo/redo journal and autosave
+def record_move(kind, row, col, old, old_notes):
+    new, new_notes = board.get(row, col), board.notes_mask(row, col)
+    if (old, old_notes) != (new, new_notes):
+        clear_hint()
+        save_move(OP_RECORD, journal.record(kind, row * SIDE + col, old, new, old_notes, new_notes))
+
+def step_journal(step, op):
+    # Undo or redo one move and select the cell it touched
+    global selected_cell
+    entry = step(board)
+    if entry is None:
+        return
+    row, col = divmod(entry[1], SIDE)
+    selected_cell = (row, col)
+    clear_hint()
+    invalidate_cell(row, col)
+    invalidate_conflicts(row, col, entry[2], entry[3])
+    save_move(op, None)
+
+def undo():
+    step_journal(journal.undo, OP_UNDO)
+
+def redo():
+    step_journal(journal.redo, OP_REDO)
+
+def save_move(op, entry):
+    session_store.log(op, entry, game_time)
+    if session_store.needs_checkpoint():
+        save_checkpoint()
+
+def save_checkpoint():
+    session_store.checkpoint(board, journal, current_difficulty, hints_remaining, game_time)
 
 def format_time(seconds):
     minutes, seconds = divmod(int(seconds), 60)
@@ -321,118 +587,371 @@ def format_time(seconds):
         return f"{hours}:{minutes:02d}:{seconds:02d}"
     return f"{minutes:02d}:{seconds:02d}"
 
-def draw_board():
-    # Draw board background with shadow
-    board_rect = pygame.Rect(50, 100, 500, 500)
+# Retained rendering: everything that only changes with the puzzle or theme
+# lives in static_layer; per frame only the dirty regions are redrawn on top.
+CELL_SIZE = 500 // SIDE
+BOARD_CELLS_RECT = pygame.Rect(50, 100, CELL_SIZE * SIDE, CELL_SIZE * SIDE)
+PAD_RECT = pygame.Rect((WIDTH - 400) // 2, 620, 400, 60)
+static_layer = None
+full_redraw = True
+dirty_cells = set()
+drawn_selection = None
+drawn_buttons = {}
+drawn_time_text = None
+drawn_hint_message = ""
+timer_rect = pygame.Rect(WIDTH // 2, 40, 0, 0)
+HINT_TEXT_RECT = pygame.Rect(50, 600, 500, 20)
+
+def set_board_size(base):
+    # Switch the layout, fonts and puzzle supply to BASE^2 x BASE^2 boards
+    global BASE, SIDE, CELL_SIZE, BOARD_CELLS_RECT, font_digit, font_note, puzzle_pool
+    BASE, SIDE = base, base * base
+    CELL_SIZE = 500 // SIDE
+    BOARD_CELLS_RECT = pygame.Rect(50, 100, CELL_SIZE * SIDE, CELL_SIZE * SIDE)
+    if base == 3:
+        font_digit, font_note = font_large, font_small
+    else:
+        # Keep the 9x9 proportions: 36pt digits in 55px cells, 16pt notes
+        # in 18px note slots
+        font_digit = pygame.font.SysFont('Arial', max(8, CELL_SIZE * 36 // 55), bold=True)
+        font_note = pygame.font.SysFont('Arial', max(6, CELL_SIZE // base * 16 // 18))
+    if puzzle_pool.base != base:
+        started = puzzle_pool.executor is not None
+        puzzle_pool.shutdown()
+        puzzle_pool = PuzzlePool(size=POOL_SIZE, base=base, seen=played_puzzles, seed=game_seed)
+        if started:
+            puzzle_pool.start()
+    invalidate_static()
+
+def pad_layout():
+    # Number pad columns and cell size; boards past 9x9 use two rows
+    columns = SIDE if SIDE <= 9 else (SIDE + 1) // 2
+    rows = (SIDE + columns - 1) // columns
+    return columns, PAD_RECT.width // columns, PAD_RECT.height // rows
+
+def key_digit(event):
+    # Digit typed on the keyboard: 1-9, then A, B, ... on larger boards
+    if pygame.K_1 <= event.key <= pygame.K_9:
+        num = event.key - pygame.K_0
+    elif SIDE > 9 and pygame.K_a <= event.key <= pygame.K_z:
+        num = event.key - pygame.K_a + 10
+    else:
+        return None
+    return num if num <= SIDE else None
+
+def invalidate_static():
+    global static_layer, full_redraw
+    static_layer = None
+    full_redraw = True
+
+def invalidate_all():
+    global full_redraw
+    full_redraw = True
+
+def invalidate_cell(row, col):
+    dirty_cells.add((row, col))
+
+def invalidate_conflicts(row, col, old, new):
+    # Peers holding the old or new digit may have gained or lost a conflict
+    for peer in board.peers(row, col):
+        if board.get(*peer) in (old, new) and board.get(*peer):
+            invalidate_cell(*peer)
+
+def get_cell_rect(row, col):
+    return pygame.Rect(50 + col * CELL_SIZE, 100 + row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+
+def selection_rects(cell):
+    # Row, column and box strips highlighted around a selected cell
+    if not cell:
+        return []
+    row, col = cell
+    box_row, box_col = row // BASE * BASE, col // BASE * BASE
+    return [
+        pygame.Rect(50, 100 + row * CELL_SIZE, CELL_SIZE * SIDE, CELL_SIZE),
+        pygame.Rect(50 + col * CELL_SIZE, 100, CELL_SIZE, CELL_SIZE * SIDE),
+        pygame.Rect(50 + box_col * CELL_SIZE, 100 + box_row * CELL_SIZE, CELL_SIZE * BASE, CELL_SIZE * BASE),
+    ]
+
+def cells_in(region):
+    clip = region.clip(BOARD_CELLS_RECT)
+    if clip.width == 0 or clip.height == 0:
+        return []
+    first_row, last_row = (clip.top - 100) // CELL_SIZE, (clip.bottom - 101) // CELL_SIZE
+    first_col, last_col = (clip.left - 50) // CELL_SIZE, (clip.right - 51) // CELL_SIZE
+    return [(row, col) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
+
+def button_area(btn):
+    # Button rect plus the shadow drawn below it
+    area = btn.rect.copy()
+    area.height += 3
+    return area
+
+def button_state(btn):
+    return (btn.text, btn.toggled, btn.hover_level())
+
+def build_static_layer():
+    global static_layer
+    layer = pygame.Surface((WIDTH, HEIGHT))
+    layer.fill(colors.bg_primary)
+    
+    # Board background with shadow
+    board_rect = BOARD_CELLS_RECT.copy()
     shadow_rect = board_rect.copy()
     shadow_rect.x += 5
     shadow_rect.y += 5
-    pygame.draw.rect(screen, (*colors.shadow[:3], 76), shadow_rect, border_radius=15)
-    pygame.draw.rect(screen, colors.bg_secondary, board_rect, border_radius=15)
+    pygame.draw.rect(layer, (*colors.shadow[:3], 76), shadow_rect, border_radius=15)
+    pygame.draw.rect(layer, colors.bg_secondary, board_rect, border_radius=15)
     
-    cell_size = 500 // 9
-    for i in range(10):
-        line_weight = 3 if i % 3 == 0 else 1
-        line_color = colors.grid_line_dark if i % 3 == 0 else colors.grid_line_light
+    for i in range(SIDE + 1):
+        line_weight = 3 if i % BASE == 0 else 1
+        line_color = colors.grid_line_dark if i % BASE == 0 else colors.grid_line_light
         
         # Horizontal lines
-        pygame.draw.line(screen, line_color, 
-                        (50, 100 + i * cell_size), 
-                        (550, 100 + i * cell_size), line_weight)
+        pygame.draw.line(layer, line_color, 
+                        (BOARD_CELLS_RECT.left, BOARD_CELLS_RECT.top + i * CELL_SIZE), 
+                        (BOARD_CELLS_RECT.right, BOARD_CELLS_RECT.top + i * CELL_SIZE), line_weight)
         
         # Vertical lines
-        pygame.draw.line(screen, line_color, 
-                        (50 + i * cell_size, 100), 
-                        (50 + i * cell_size, 600), line_weight)
-    
-    # Draw cells
-    for row in range(9):
-        for col in range(9):
-            cell_rect = pygame.Rect(50 + col * cell_size, 100 + row * cell_size, cell_size, cell_size)
-            
-            # Highlight selected cell and related cells
-            if selected_cell and (row == selected_cell[0] or col == selected_cell[1] or 
-                                (row // 3 == selected_cell[0] // 3 and col // 3 == selected_cell[1] // 3)):
-                pygame.draw.rect(screen, colors.cell_highlight, cell_rect)
-            
-            # Highlight selected cell
-            if selected_cell and row == selected_cell[0] and col == selected_cell[1]:
-                pygame.draw.rect(screen, colors.accent_light, cell_rect)
-            
-            # Draw number or notes
-            if board[row][col] != 0:
-                is_original = original_board[row][col] != 0
-                number_color = colors.cell_given if is_original else colors.cell_user
-                number_surf = font_large.render(str(board[row][col]), True, number_color)
-                number_rect = number_surf.get_rect(center=(cell_rect.centerx, cell_rect.centery))
-                screen.blit(number_surf, number_rect)
-            elif notes[row][col]:
-                note_size = cell_size // 3
-                for note in notes[row][col]:
-                    note_surf = font_small.render(str(note), True, colors.text_secondary)
-                    note_x = cell_rect.x + ((note-1) % 3) * note_size + note_size // 2
-                    note_y = cell_rect.y + ((note-1) // 3) * note_size + note_size // 2
-                    note_rect = note_surf.get_rect(center=(note_x, note_y))
-                    screen.blit(note_surf, note_rect)
-
-def draw_ui():
-    # Draw game header
-    title_surf = font_large.render("Modern Sudoku", True, colors.accent)
-    screen.blit(title_surf, (20, 20))
-    
-    difficulty_surf = font_medium.render(f"Difficulty: {difficulty_levels[current_difficulty]}", True, colors.text_secondary)
-    screen.blit(difficulty_surf, (20, 70))
+        pygame.draw.line(layer, line_color, 
+                        (BOARD_CELLS_RECT.left + i * CELL_SIZE, BOARD_CELLS_RECT.top), 
+                        (BOARD_CELLS_RECT.left + i * CELL_SIZE, BOARD_CELLS_RECT.bottom), line_weight)
     
-    # Draw timer
-    time_surf = font_medium.render(f"Time: {format_time(game_time)}", True, colors.text_primary)
-    time_rect = time_surf.get_rect(midtop=(WIDTH//2, 40))
-    screen.blit(time_surf, time_rect)
+    # Given digits
+    for row in range(SIDE):
+        for col in range(SIDE):
+            if board.is_given(row, col):
+                number_surf = render_text(font_digit, symbol(board.get(row, col)), colors.cell_given)
+                number_rect = number_surf.get_rect(center=get_cell_rect(row, col).center)
+                layer.blit(number_surf, number_rect)
     
-    # Draw buttons
-    new_game_btn.draw()
-    theme_btn.draw()
-    hint_btn.draw()
-    pencil_btn.draw()
+    # Game header
+    title_surf = render_text(font_large, "Modern Sudoku", colors.accent)
+    layer.blit(title_surf, (20, 20))
     
-    for btn in difficulty_btns:
-        btn.draw()
+    difficulty_surf = render_text(font_medium, f"Difficulty: {difficulty_levels[current_difficulty]}", colors.text_secondary)
+    layer.blit(difficulty_surf, (20, 70))
     
-    # Draw number pad
-    pad_width = 400
-    pad_rect = pygame.Rect((WIDTH - pad_width) // 2, 620, pad_width, 60)
-    pygame.draw.rect(screen, colors.bg_secondary, pad_rect, border_radius=10)
-    pygame.draw.rect(screen, colors.grid_line_light, pad_rect, width=1, border_radius=10)
+    # Number pad
+    pygame.draw.rect(layer, colors.bg_secondary, PAD_RECT, border_radius=10)
+    pygame.draw.rect(layer, colors.grid_line_light, PAD_RECT, width=1, border_radius=10)
     
-    pad_cell_size = pad_width // 9
-    for i in range(9):
-        cell_rect = pygame.Rect(pad_rect.x + i * pad_cell_size, pad_rect.y, pad_cell_size, 60)
-        number_surf = font_medium.render(str(i+1), True, colors.text_primary)
+    columns, pad_cell_width, pad_cell_height = pad_layout()
+    for i in range(SIDE):
+        cell_rect = pygame.Rect(PAD_RECT.x + i % columns * pad_cell_width, PAD_RECT.y + i // columns * pad_cell_height,
+                                pad_cell_width, pad_cell_height)
+        number_surf = render_text(font_medium, symbol(i + 1), colors.text_primary)
         number_rect = number_surf.get_rect(center=cell_rect.center)
+        layer.blit(number_surf, number_rect)
+    
+    static_layer = layer
+
+def draw_cell(row, col):
+    cell_rect = get_cell_rect(row, col)
+    highlighted = False
+    
+    # Highlight selected cell and related cells
+    if selected_cell and (row == selected_cell[0] or col == selected_cell[1] or 
+                        (row // BASE == selected_cell[0] // BASE and col // BASE == selected_cell[1] // BASE)):
+        pygame.draw.rect(screen, colors.cell_highlight, cell_rect)
+        highlighted = True
+    
+    # Highlight the cells of the hint on display
+    if (row, col) in hint_cells:
+        pygame.draw.rect(screen, colors.cell_hint, cell_rect)
+        highlighted = True
+    
+    # Highlight selected cell
+    if selected_cell and row == selected_cell[0] and col == selected_cell[1]:
+        pygame.draw.rect(screen, colors.accent_light, cell_rect)
+    
+    # Draw number or notes. Givens are already on the static layer unless a
+    # highlight was painted over them.
+    value = board.get(row, col)
+    if value != 0:
+        is_original = board.is_given(row, col)
+        if is_original and not highlighted:
+            return
+        if is_original:
+            number_color = colors.cell_given
+        elif board.has_conflict(row, col):
+            number_color = colors.cell_conflict
+        else:
+            number_color = colors.cell_user
+        number_surf = render_text(font_digit, symbol(value), number_color)
+        number_rect = number_surf.get_rect(center=(cell_rect.centerx, cell_rect.centery))
         screen.blit(number_surf, number_rect)
+    elif board.notes_mask(row, col):
+        note_size = CELL_SIZE // BASE
+        for note in board.note_digits(row, col):
+            note_surf = render_text(font_note, symbol(note), colors.text_secondary)
+            note_x = cell_rect.x + ((note-1) % BASE) * note_size + note_size // 2
+            note_y = cell_rect.y + ((note-1) // BASE) * note_size + note_size // 2
+            note_rect = note_surf.get_rect(center=(note_x, note_y))
+            screen.blit(note_surf, note_rect)
+
+def draw_board(region=None):
+    # Redraw the whole board, or only the cells touching `region`
+    if static_layer is None:
+        build_static_layer()
+    
+    if region is None:
+        screen.blit(static_layer, (0, 0))
+        cells = [(row, col) for row in range(SIDE) for col in range(SIDE)]
+    else:
+        screen.blit(static_layer, region.topleft, region)
+        cells = cells_in(region)
+    
+    for row, col in cells:
+        draw_cell(row, col)
+
+def draw_ui(region=None):
+    global timer_rect
+    
+    # Draw timer
+    time_surf = render_text(font_medium, f"Time: {format_time(game_time)}", colors.text_primary)
+    timer_rect = time_surf.get_rect(midtop=(WIDTH//2, 40))
+    if region is None or timer_rect.colliderect(region):
+        screen.blit(time_surf, timer_rect)
+    
+    # Draw the hint explanation below the board
+    if hint_message and (region is None or HINT_TEXT_RECT.colliderect(region)):
+        hint_surf = render_text(font_small, hint_message, colors.text_secondary)
+        screen.blit(hint_surf, hint_surf.get_rect(center=HINT_TEXT_RECT.center))
+    
+    # Draw buttons
+    for btn in game_btns:
+        if region is None or button_area(btn).colliderect(region):
+            btn.draw()
+
+def render_playing():
+    # Draw the playing screen, pushing only the changed regions to the display
+    global full_redraw, drawn_selection, drawn_buttons, drawn_time_text, drawn_hint_message
+    time_text = format_time(game_time)
+    
+    if full_redraw:
+        draw_board()
+        profiler.mark("draw_board")
+        draw_ui()
+        profiler.mark("draw_ui")
+        if profiler.enabled:
+            draw_perf_overlay()
+        pygame.display.flip()
+        profiler.mark("flip")
+    else:
+        rects = [get_cell_rect(row, col) for row, col in dirty_cells]
+        if selected_cell != drawn_selection:
+            rects += selection_rects(drawn_selection) + selection_rects(selected_cell)
+        for btn in game_btns:
+            if button_state(btn) != drawn_buttons.get(btn):
+                rects.append(button_area(btn))
+        if time_text != drawn_time_text:
+            old_timer_rect = timer_rect.copy()
+            time_surf = render_text(font_medium, f"Time: {time_text}", colors.text_primary)
+            rects.append(time_surf.get_rect(midtop=(WIDTH//2, 40)).union(old_timer_rect))
+        if hint_message != drawn_hint_message:
+            rects.append(HINT_TEXT_RECT)
+        
+        if profiler.enabled:
+            rects.append(PERF_OVERLAY_RECT)
+        
+        for rect in rects:
+            screen.set_clip(rect)
+            draw_board(rect)
+            profiler.mark("draw_board")
+            draw_ui(rect)
+            profiler.mark("draw_ui")
+        screen.set_clip(None)
+        if profiler.enabled:
+            draw_perf_overlay()
+        if rects:
+            pygame.display.update(rects)
+        profiler.mark("flip")
+    
+    full_redraw = False
+    dirty_cells.clear()
+    drawn_selection = selected_cell
+    drawn_buttons = {btn: button_state(btn) for btn in game_btns}
+    drawn_time_text = time_text
+    drawn_hint_message = hint_message
+
+# Performance overlay (F3): FPS, frame-time percentiles and mean time per phase
+PERF_OVERLAY_RECT = pygame.Rect(10, 10, 240, 190)
+
+def draw_perf_overlay():
+    panel = pygame.Surface(PERF_OVERLAY_RECT.size, pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 180))
+    stats = profiler.summary()
+    if stats is None:
+        lines = ["Collecting frames..."]
+    else:
+        lines = [
+            f"FPS {stats['fps']:.1f}",
+            f"Frame p50 {stats['p50']:.2f}  p95 {stats['p95']:.2f}  p99 {stats['p99']:.2f} ms",
+        ]
+        for phase, ms in stats["phases"].items():
+            lines.append(f"  {phase:<12} {ms:7.3f} ms")
+    for i, line in enumerate(lines[:10]):
+        panel.blit(font_small.render(line, True, (255, 255, 255)), (8, 6 + i * 18))
+    screen.blit(panel, PERF_OVERLAY_RECT)
+
+def toggle_perf_overlay():
+    profiler.toggle()
+    invalidate_all()
+
+# Start screen assets: one small tile per decoration alpha, a handful of
+# pre-chosen tile layouts that are cycled instead of re-rolled every frame,
+# plus the title glyphs and their x positions. Rebuilt after a theme change.
+DECOR_FRAMES = 8
+DECOR_FRAME_TIME = 1 / 60
+start_screen_assets = {}
+
+def build_start_screen_assets():
+    # Decorative grid pattern in the background
+    cell_size = 40
+    tiles = {}
+    for alpha in range(5, 21):
+        tile = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+        pygame.draw.rect(tile, (*colors.accent, alpha), 
+                       (0, 0, cell_size, cell_size), 1, border_radius=3)
+        tiles[alpha] = tile
+    
+    frames = []
+    for _ in range(DECOR_FRAMES):
+        frame = []
+        for row in range(HEIGHT // cell_size + 1):
+            for col in range(WIDTH // cell_size + 1):
+                if rng.random() < 0.1:  # Only draw some cells for a sparse effect
+                    alpha = rng.randint(5, 20)  # Very subtle transparency
+                    frame.append((tiles[alpha], (col * cell_size, row * cell_size)))
+        frames.append(frame)
+    start_screen_assets["decor"] = frames
+    
+    title_text = "Modern Sudoku"
+    start_screen_assets["title"] = [
+        (render_text(font_title, char, colors.accent), WIDTH // 2 - len(title_text) * 15 + i * 30, i * 0.3)
+        for i, char in enumerate(title_text)
+    ]
+    
+    subtitle_surf = render_text(font_large, "Select Difficulty", colors.text_secondary)
+    start_screen_assets["subtitle"] = (subtitle_surf, subtitle_surf.get_rect(center=(WIDTH // 2, HEIGHT // 4 + 80)))
 
 def draw_start_screen():
+    if not start_screen_assets:
+        build_start_screen_assets()
+    
     # Draw title with animation
-    current_time = pygame.time.get_ticks() / 1000
+    current_time = start_screen_time()
     wave_height = 5
     wave_speed = 2
-    
-    title_text = "Modern Sudoku"
     base_y = HEIGHT // 4
     
-    for i, char in enumerate(title_text):
+    for char_surf, x, phase in start_screen_assets["title"]:
         # Calculate wavy position
-        offset_y = math.sin(current_time * wave_speed + i * 0.3) * wave_height
-        char_surf = font_title.render(char, True, colors.accent)
-        char_rect = char_surf.get_rect()
-        char_rect.x = WIDTH // 2 - len(title_text) * 15 + i * 30
-        char_rect.y = base_y + offset_y
-        screen.blit(char_surf, char_rect)
+        offset_y = math.sin(current_time * wave_speed + phase) * wave_height
+        screen.blit(char_surf, (x, round(base_y + offset_y)))
     
     # Draw subtitle
-    subtitle = "Select Difficulty"
-    subtitle_surf = font_large.render(subtitle, True, colors.text_secondary)
-    subtitle_rect = subtitle_surf.get_rect(center=(WIDTH // 2, base_y + 80))
-    screen.blit(subtitle_surf, subtitle_rect)
+    screen.blit(*start_screen_assets["subtitle"])
     
     # Draw buttons
     for btn in start_screen_btns:
@@ -440,34 +959,30 @@ def draw_start_screen():
     
     # Draw theme toggle
     dark_mode_toggle.draw()
+    if saved_session is not None:
+        resume_btn.draw()
     
     # Draw decorative elements
-    # Grid pattern in background
-    cell_size = 40
-    for row in range(HEIGHT // cell_size + 1):
-        for col in range(WIDTH // cell_size + 1):
-            if random.random() < 0.1:  # Only draw some cells for a sparse effect
-                alpha = random.randint(5, 20)  # Very subtle transparency
-                cell_rect = pygame.Rect(col * cell_size, row * cell_size, cell_size, cell_size)
-                cell_surface = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
-                pygame.draw.rect(cell_surface, (*colors.accent, alpha), 
-                               (0, 0, cell_size, cell_size), 1, border_radius=3)
-                screen.blit(cell_surface, cell_rect)
+    frames = start_screen_assets["decor"]
+    screen.blits(frames[int(current_time / DECOR_FRAME_TIME) % len(frames)], doreturn=False)
 
 def check_win():
-    for row in range(9):
-        for col in range(9):
-            if board[row][col] != solution[row][col]:
-                return False
-    return True
+    return core.check_win(board)
 
 def show_win_message():
+    # Record the game; best and median show up once the writer has counted it
+    base = board.geo.base
+    stats = stats_store.level(base, current_difficulty)
+    games = stats.games if stats is not None else 0
+    stats_store.record(board, current_difficulty, game_time, core.HINTS_PER_GAME - hints_remaining)
+    stats_shown = False
+    
     overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
     overlay.fill((0, 0, 0, 128))
     screen.blit(overlay, (0, 0))
     
-    message_surf = font_large.render("Puzzle Solved!", True, (255, 255, 255))
-    time_surf = font_medium.render(f"Time: {format_time(game_time)}", True, (220, 220, 220))
+    message_surf = render_text(font_large, "Puzzle Solved!", (255, 255, 255))
+    time_surf = render_text(font_medium, f"Time: {format_time(game_time)}", (220, 220, 220))
     
     message_rect = message_surf.get_rect(center=(WIDTH//2, HEIGHT//2 - 30))
     time_rect = time_surf.get_rect(center=(WIDTH//2, HEIGHT//2 + 30))
@@ -484,131 +999,333 @@ def show_win_message():
     
     # Wait for user interaction
     btn_clicked = False
+    mode = "idle"
     while not btn_clicked:
-        for event in pygame.event.get():
+        for event in next_events(mode):
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                return False
             
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = pointer_position()
                 if return_btn.rect.collidepoint(mouse_pos):
                     btn_clicked = True
                     return_to_menu()
         
+        # Best and median times, once STATS_READY has woken the loop
+        stats = stats_store.level(base, current_difficulty)
+        if not stats_shown and stats is not None and stats.games > games:
+            stats_surf = render_text(font_small, f"Best: {format_time(stats.best)}   Median: {format_time(stats.median)}   "
+                                     f"Games: {stats.games}", (200, 200, 200))
+            screen.blit(stats_surf, stats_surf.get_rect(center=(WIDTH//2, HEIGHT//2 + 60)))
+            stats_shown = True
+        
         # Update button
-        return_btn.update(pygame.mouse.get_pos(), False)
+        return_btn.update(pointer_position(), False)
         return_btn.draw()
         pygame.display.flip()
-        clock.tick(FPS)
+        mode = "animating" if return_btn.is_animating() else "idle"
+    return True
 
 def return_to_menu():
     global game_state
     game_state = "start_screen"
     return True
 
-# Main game loop
-running = True
-win_shown = False
-while running:
-    mouse_clicked = False
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            mouse_clicked = True
-            
-            if game_state == "playing":
-                # Check if clicked on board
-                mouse_pos = pygame.mouse.get_pos()
-                board_rect = pygame.Rect(50, 100, 500, 500)
-                if board_rect.collidepoint(mouse_pos):
-                    cell_size = 500 // 9
-                    col = (mouse_pos[0] - 50) // cell_size
-                    row = (mouse_pos[1] - 100) // cell_size
-                    if 0 <= row < 9 and 0 <= col < 9:
-                        selected_cell = (row, col)
-                
-                # Check if clicked on number pad
-                pad_rect = pygame.Rect((WIDTH - 400) // 2, 620, 400, 60)
-                if pad_rect.collidepoint(mouse_pos) and selected_cell:
-                    pad_cell_size = 400 // 9
-                    num = (mouse_pos[0] - pad_rect.x) // pad_cell_size + 1
-                    row, col = selected_cell
-                    
-                    if 1 <= num <= 9 and original_board[row][col] == 0:
-                        if pencil_mode:
-                            if num in notes[row][col]:
-                                notes[row][col].remove(num)
-                            else:
-                                notes[row][col].add(num)
-                        else:
-                            if board[row][col] == num:
-                                board[row][col] = 0
-                            else:
-                                board[row][col] = num
-                                notes[row][col] = set()  # Clear notes when entering a number
-        
-        if event.type == pygame.KEYDOWN and game_state == "playing":
-            if selected_cell:
-                row, col = selected_cell
-                if event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE:
-                    if original_board[row][col] == 0:
-                        board[row][col] = 0
-                        notes[row][col] = set()
-                elif event.key == pygame.K_n:
-                    toggle_pencil_mode()
-                elif event.key == pygame.K_h:
-                    use_hint()
-                elif event.key in [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5, 
-                                pygame.K_6, pygame.K_7, pygame.K_8, pygame.K_9] and original_board[row][col] == 0:
-                    num = event.key - pygame.K_0  # Convert key to number
-                    if pencil_mode:
-                        if num in notes[row][col]:
-                            notes[row][col].remove(num)
-                        else:
-                            notes[row][col].add(num)
-                    else:
-                        if board[row][col] == num:
-                            board[row][col] = 0
-                        else:
-                            board[row][col] = num
-                            notes[row][col] = set()  # Clear notes when entering a number
-    
-    # Update game time
-    if game_state == "playing" and not win_shown:
-        game_time = time.time() - start_time
-    
-    # Update UI button states
-    mouse_pos = pygame.mouse.get_pos()
+# Input recording (--record) and replay (--replay). Frames are numbered as
+# they ask for input; a replay hands every recorded event to the frame it
+# arrived in, without waiting, and quits after the last one.
+recorder = None
+replay_frames = None
+replay_last_frame = 0
+replay_pointer = (0, 0)
+frame_index = 0
+
+def next_events(mode, timeout=1.0):
+    global frame_index, replay_pointer
+    frame_index += 1
+    if replay_frames is not None:
+        if frame_index > replay_last_frame:
+            return [pygame.event.Event(pygame.QUIT)]
+        events = replay_frames.get(frame_index, [])
+        for event in events:
+            if event.type != pygame.KEYDOWN:
+                replay_pointer = event.pos
+        return events
     
+    events = scheduler.next_events(mode, timeout)
+    if recorder is not None:
+        record_events(events)
+    return events
+
+def pointer_position():
+    if replay_frames is not None:
+        return replay_pointer
+    return pygame.mouse.get_pos()
+
+def record_events(events):
+    for i, event in enumerate(events):
+        if event.type == pygame.KEYDOWN:
+            recorder.record(frame_index, KEY, event.key, event.mod)
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            recorder.record(frame_index, CLICK, event.pos[0], event.pos[1], event.button)
+        elif event.type == pygame.MOUSEMOTION:
+            # Only where the pointer ends up in this frame matters
+            if not any(later.type == pygame.MOUSEMOTION for later in events[i + 1:]):
+                recorder.record(frame_index, MOTION, event.pos[0], event.pos[1])
+
+def load_replay(path):
+    # Group the recorded events by frame; returns the recording's (base, seed)
+    global replay_frames, replay_last_frame
+    base, seed, records = read_recording(path)
+    replay_frames = {}
+    for frame, _, kind, a, b, c in records:
+        if kind == KEY:
+            event = pygame.event.Event(pygame.KEYDOWN, key=a, mod=b, unicode="", scancode=0)
+        elif kind == CLICK:
+            event = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(a, b), button=c)
+        else:
+            event = pygame.event.Event(pygame.MOUSEMOTION, pos=(a, b), rel=(0, 0), buttons=(0, 0, 0))
+        replay_frames.setdefault(frame, []).append(event)
+        replay_last_frame = max(replay_last_frame, frame)
+    return base, seed
+
+def print_replay_report():
+    stats = profiler.summary()
+    if stats is None:
+        print("Replay too short to report")
+        return
+    print(f"Replayed {stats['frames']} frames ({stats['fps']:.1f} FPS)")
+    print(f"Frame p50 {stats['p50']:.2f}  p95 {stats['p95']:.2f}  p99 {stats['p99']:.2f}  max {stats['max']:.2f} ms")
+    for phase, ms in stats["phases"].items():
+        print(f"  {phase:<12} {ms:7.3f} ms")
+
+INPUT_EVENTS = {pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN}
+
+def note_input(events):
+    global last_input_time
+    if any(event.type in INPUT_EVENTS for event in events):
+        last_input_time = pygame.time.get_ticks() / 1000
+
+def start_screen_time():
+    # Clock for the start screen's animations. It stops AMBIENT_TIMEOUT
+    # seconds after the last input, so an unattended screen stands still.
+    return min(pygame.time.get_ticks() / 1000, last_input_time + AMBIENT_TIMEOUT)
+
+def frame_mode():
+    # How soon the next frame is needed: "animating", "ambient" or "idle"
     if game_state == "playing":
-        for btn in [new_game_btn, theme_btn, hint_btn, pencil_btn] + difficulty_btns:
-            btn.update(mouse_pos, mouse_clicked)
-    else:  # Start screen
-        dark_mode_toggle.update(mouse_pos, mouse_clicked)
-        for btn in start_screen_btns:
-            btn.update(mouse_pos, mouse_clicked)
+        buttons = game_btns
+    else:
+        buttons = start_screen_btns + [dark_mode_toggle, resume_btn]
+    if any(btn.is_animating() for btn in buttons):
+        return "animating"
+    if game_state != "playing" and pygame.time.get_ticks() / 1000 < last_input_time + AMBIENT_TIMEOUT:
+        return "ambient"
+    return "idle"
+
+def seconds_to_next_tick():
+    # Wake up in time to show the next timer second; the start screen has
+    # no timer and sleeps until input
+    if game_state != "playing":
+        return None
+    return 1.0 - game_time % 1.0
+
+def handle_event(event):
+    # Apply one input event to the game state. Returns False on quit.
+    global selected_cell, hint_waiting
+    if event.type == pygame.QUIT:
+        return False
     
-    # Draw screen
-    screen.fill(colors.bg_primary)
+    if event.type == HINT_READY:
+        hint = hint_engine.get(board) if hint_waiting and game_state == "playing" else None
+        if hint is not None:
+            show_hint(hint)
+            hint_waiting = False
+        return True
     
-    if game_state == "playing":
-        draw_board()
-        draw_ui()
+    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+        toggle_perf_overlay()
+        return True
+    
+    if event.type == pygame.MOUSEBUTTONDOWN and game_state == "playing":
+        # Check if clicked on board
+        mouse_pos = event.pos
+        if BOARD_CELLS_RECT.collidepoint(mouse_pos):
+            col = (mouse_pos[0] - 50) // CELL_SIZE
+            row = (mouse_pos[1] - 100) // CELL_SIZE
+            if 0 <= row < SIDE and 0 <= col < SIDE:
+                selected_cell = (row, col)
         
-        # Check for win
-        if check_win() and not win_shown:
-            win_shown = True
-            show_win_message()
-            win_shown = False
-    else:
-        draw_start_screen()
+        # Check if clicked on number pad
+        if PAD_RECT.collidepoint(mouse_pos):
+            columns, pad_cell_width, pad_cell_height = pad_layout()
+            col = (mouse_pos[0] - PAD_RECT.x) // pad_cell_width
+            num = (mouse_pos[1] - PAD_RECT.y) // pad_cell_height * columns + col + 1
+            if col < columns and 1 <= num <= SIDE:
+                enter_number(num)
     
-    pygame.display.flip()
-    clock.tick(FPS)
+    if event.type == pygame.KEYDOWN and game_state == "playing" and event.mod & pygame.KMOD_CTRL:
+        # Ctrl+Z undoes, Ctrl+Y or Ctrl+Shift+Z redoes
+        if event.key == pygame.K_y or (event.key == pygame.K_z and event.mod & pygame.KMOD_SHIFT):
+            redo()
+            return True
+        if event.key == pygame.K_z:
+            undo()
+            return True
+    
+    # On boards past 9x9 letters are digits too, and win over the shortcuts
+    num = key_digit(event) if event.type == pygame.KEYDOWN else None
+    
+    if event.type == pygame.KEYDOWN and game_state == "playing" and event.key == pygame.K_h and num is None:
+        use_hint()
+        return True
+    
+    if event.type == pygame.KEYDOWN and game_state == "playing" and selected_cell:
+        if event.key == pygame.K_DELETE or event.key == pygame.K_BACKSPACE:
+            clear_selected_cell()
+        elif num is not None:
+            enter_number(num)
+        elif event.key == pygame.K_n:
+            toggle_pencil_mode()
+    
+    return True
+
+# Main game loop
+def run(max_frames=None):
+    global game_time
+    running = True
+    win_shown = False
+    drawn_state = None
+    mode = "animating"
+    frames = 0
+    while running and (max_frames is None or frames < max_frames):
+        frames += 1
+        mouse_clicked = False
+        profiler.start_frame()
+        
+        events = next_events(mode, seconds_to_next_tick())
+        note_input(events)
+        profiler.mark("wait")
+        for event in events:
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_clicked = True
+            if not handle_event(event):
+                running = False
+        profiler.mark("events")
+        
+        # Update game time
+        if game_state == "playing" and not win_shown:
+            game_time = time.time() - start_time
+        
+        # Update UI button states
+        mouse_pos = pointer_position()
+        
+        if game_state == "playing":
+            for btn in game_btns:
+                btn.update(mouse_pos, mouse_clicked)
+        else:  # Start screen
+            dark_mode_toggle.update(mouse_pos, mouse_clicked)
+            if saved_session is not None:
+                resume_btn.update(mouse_pos, mouse_clicked)
+            for btn in start_screen_btns:
+                btn.update(mouse_pos, mouse_clicked)
+        profiler.mark("update")
+        
+        # Draw screen
+        if game_state != drawn_state:
+            invalidate_all()
+            drawn_state = game_state
+        
+        if game_state == "playing":
+            render_playing()
+            
+            # Check for win
+            won = check_win()
+            profiler.mark("check_win")
+            if won and not win_shown:
+                win_shown = True
+                session_store.clear()
+                if not show_win_message():
+                    running = False
+                win_shown = False
+        else:
+            screen.fill(colors.bg_primary)
+            draw_start_screen()
+            if profiler.enabled:
+                draw_perf_overlay()
+            profiler.mark("draw_start")
+            pygame.display.flip()
+            profiler.mark("flip")
+        
+        profiler.end_frame()
+        mode = frame_mode()
+
+def seed_arg(value):
+    # Recordings store the seed as an unsigned 64-bit integer
+    seed = int(value)
+    if not 0 <= seed < 1 << 64:
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and {(1 << 64) - 1}")
+    return seed
+
+def main(argv=None):
+    global BASE, game_seed, saved_session, session_store, stats_store, recorder
+    parser = argparse.ArgumentParser(description="Modern Sudoku")
+    parser.add_argument("--fps", type=int, default=FPS, help="frame-rate cap while animating")
+    parser.add_argument("--headless", action="store_true", help="run without a window (SDL dummy video driver)")
+    parser.add_argument("--frames", type=int, default=None, help="exit after this many frames")
+    parser.add_argument("--profile-log", metavar="PATH", help="stream per-frame phase timings to a .csv or .jsonl file")
+    parser.add_argument("--base", type=int, default=BASE, choices=range(MIN_BASE, MAX_BASE + 1),
+                        help="box size: 2 for 4x4, 3 for 9x9, 4 for 16x16, 5 for 25x25 boards")
+    parser.add_argument("--seed", type=seed_arg, help="seed puzzles and decoration for a reproducible run")
+    parser.add_argument("--record", metavar="PATH", help="record input to PATH for --replay")
+    parser.add_argument("--replay", metavar="PATH", help="replay recorded input as fast as possible and report frame timings")
+    args = parser.parse_args(argv)
+    
+    BASE, game_seed = args.base, args.seed
+    if args.replay:
+        BASE, game_seed = load_replay(args.replay)
+    elif args.record and game_seed is None:
+        game_seed = random.getrandbits(63)
+    if game_seed is not None:
+        rng.seed(game_seed)
+        puzzle_pool.seed = game_seed
+    
+    init(headless=args.headless)
+    scheduler.max_fps = args.fps
+    if args.record or args.replay:
+        # Start from the same screen every time and find hints on the frame
+        # they are asked for; a replay leaves the player's save and stats alone
+        saved_session = None
+        hint_engine.inline = True
+    if args.record:
+        recorder = Recorder(args.record, BASE, game_seed)
+    if args.replay:
+        session_store = SessionStore(None)
+        stats_store = StatsStore(None)
+        profiler.collect()
+    if game_seed is None:
+        # Seeded runs deal the same puzzles whatever was played before
+        played_puzzles.update(stats_store.load_played())
+    stats_store.start()
+    if BASE != 3 or puzzle_bank is None or not all(puzzle_bank.count(d) for d in range(len(difficulty_levels))):
+        puzzle_pool.start()
+    try:
+        if args.profile_log:
+            profiler.open_log(args.profile_log)
+        run(args.frames)
+        if args.replay:
+            print_replay_report()
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if game_state == "playing" and not check_win():
+            save_checkpoint()
+        session_store.close()
+        stats_store.close()
+        hint_engine.shutdown()
+        profiler.close()
+        puzzle_pool.shutdown()
+        pygame.quit()
 
-pygame.quit()
-sys.exit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
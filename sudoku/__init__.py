@@ -0,0 +1,9 @@
+"""Headless Sudoku engine used by the pygame front end in main.py.
+
+Importing the package only loads the pure-Python board logic; the puzzle
+pool and bank are imported from their own modules when needed.
+"""
+from .solver import solve, count_solutions, random_solution, is_solved
+from .generator import generate_board, generate_puzzle
+from .core import check_win, DIFFICULTY_LEVELS
+from .grader import grade
@@ -0,0 +1,199 @@
+"""Packed, memory-mapped puzzle bank indexed by difficulty.
+
+File layout (little endian):
+
+    header   magic b"SDKB", version u8, flags u8, side u8, levels u8,
+             record size u16, reserved u16
+    index    per level: offset u64, count u64
+    records  grouped by level; each record is difficulty u8, rating u16
+             (grader rating x 10), puzzle hash u64 (canonical.puzzle_hash),
+             the puzzle packed at 4 bits per cell and, when FLAG_SOLUTIONS
+             is set, the solution packed the same way
+
+Only the header and index are read when the bank is opened. Every puzzle is
+a fixed-size slice of the mmap, so lookups cost the same for any bank size.
+A bank never holds two puzzles that are the same up to symmetry, and
+random() can skip the ones a player has already seen by their hash.
+"""
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+
+from . import solver
+from .canonical import puzzle_hash
+from .generator import CELLS_TO_REMOVE, generate_board
+from .grader import grade
+
+MAGIC = b"SDKB"
+VERSION = 2
+FLAG_SOLUTIONS = 1
+
+HEADER = struct.Struct("<4sBBBBHH")
+INDEX_ENTRY = struct.Struct("<QQ")
+RECORD_HEADER = struct.Struct("<BHQ")
+
+# Random draws that may hit already seen puzzles before random() falls back
+# to scanning the level
+RANDOM_DRAWS = 32
+
+PACKED_SIZE = (solver.CELLS + 1) // 2
+_UNPACK = [(b >> 4, b & 15) for b in range(256)]
+
+
+def pack_cells(cells):
+    cells = list(cells)
+    if len(cells) % 2:
+        cells.append(0)
+    return bytes((cells[i] << 4) | cells[i + 1] for i in range(0, len(cells), 2))
+
+
+def unpack_cells(data):
+    cells = []
+    for b in data:
+        cells.extend(_UNPACK[b])
+    return cells[:solver.CELLS]
+
+
+class BankWriter:
+    # Records are spooled into one temporary file per level so that banks of
+    # any size can be written without holding them in memory.
+
+    def __init__(self, path, levels=4, solutions=True):
+        self.path = path
+        self.levels = levels
+        self.solutions = solutions
+        self.record_size = RECORD_HEADER.size + PACKED_SIZE * (2 if solutions else 1)
+        self.counts = [0] * levels
+        self.spools = [tempfile.TemporaryFile() for _ in range(levels)]
+        self.seen = set()
+
+    def add(self, level, board, solution=None, rating=0):
+        # Returns False, writing nothing, for a puzzle equivalent to one
+        # already in the bank
+        key = puzzle_hash(board)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        record = RECORD_HEADER.pack(level, rating, key) + pack_cells(solver.to_flat(board))
+        if self.solutions:
+            if solution is None:
+                solution = solver.solve(board)
+            record += pack_cells(solver.to_flat(solution))
+        self.spools[level].write(record)
+        self.counts[level] += 1
+        return True
+
+    def close(self):
+        flags = FLAG_SOLUTIONS if self.solutions else 0
+        offset = HEADER.size + INDEX_ENTRY.size * self.levels
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, flags, solver.SIDE, self.levels,
+                                self.record_size, 0))
+            for count in self.counts:
+                f.write(INDEX_ENTRY.pack(offset, count))
+                offset += count * self.record_size
+            for spool in self.spools:
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+                spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            for spool in self.spools:
+                spool.close()
+
+
+class PuzzleBank:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, side, levels, record_size, _ = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a puzzle bank")
+        if side != solver.SIDE:
+            raise ValueError(f"{path} holds {side}x{side} puzzles")
+        self.has_solutions = bool(flags & FLAG_SOLUTIONS)
+        self.record_size = record_size
+        self.index = [INDEX_ENTRY.unpack_from(self.data, HEADER.size + i * INDEX_ENTRY.size)
+                      for i in range(levels)]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def count(self, level):
+        if level >= len(self.index):
+            return 0
+        return self.index[level][1]
+
+    def _record(self, level, index):
+        offset, count = self.index[level]
+        if not 0 <= index < count:
+            raise IndexError(index)
+        start = offset + index * self.record_size
+        return self.data[start:start + self.record_size]
+
+    def rating(self, level, index):
+        return RECORD_HEADER.unpack_from(self._record(level, index))[1]
+
+    def key(self, level, index):
+        return RECORD_HEADER.unpack_from(self._record(level, index))[2]
+
+    def get(self, level, index):
+        # Returns (board, solution) like generate_board
+        record = self._record(level, index)
+        start = RECORD_HEADER.size
+        board = solver.to_grid(unpack_cells(record[start:start + PACKED_SIZE]))
+        if self.has_solutions:
+            solution = solver.to_grid(unpack_cells(record[start + PACKED_SIZE:]))
+        else:
+            solution = solver.solve(board)
+        return board, solution
+
+    def random(self, level, rng=random, seen=None):
+        # With `seen`, a set of puzzle hashes, only puzzles outside it are
+        # drawn and the one returned is added to it. None once every puzzle
+        # of the level has been seen.
+        count = self.count(level)
+        if seen is None:
+            return self.get(level, rng.randrange(count))
+        if not count:
+            return None
+        for _ in range(RANDOM_DRAWS):
+            index = rng.randrange(count)
+            if self.key(level, index) not in seen:
+                break
+        else:
+            # Mostly seen: walk the level from a random start
+            start = rng.randrange(count)
+            for step in range(count):
+                index = (start + step) % count
+                if self.key(level, index) not in seen:
+                    break
+            else:
+                return None
+        seen.add(self.key(level, index))
+        return self.get(level, index)
+
+
+def open_bank(path):
+    # The bank is optional: None when the file does not exist
+    if not os.path.exists(path):
+        return None
+    return PuzzleBank(path)
+
+
+def build_bank(path, per_level, solutions=True, rng=random):
+    with BankWriter(path, len(CELLS_TO_REMOVE), solutions) as writer:
+        for level in CELLS_TO_REMOVE:
+            while writer.counts[level] < per_level:
+                board, solution = generate_board(level, rng)
+                writer.add(level, board, solution, rating=round(grade(board).rating * 10))
@@ -0,0 +1,113 @@
+"""Vectorised checks over many grids at once (needs numpy).
+
+Grids are (N, side, side) uint8 arrays with 0 for empty cells, for any of
+the supported sizes (4x4, 9x9, 16x16, 25x25). Each cell is turned into a
+one-hot bit (1 << value, with 0 and anything above the side mapped to bits
+outside the target), and a unit holds every digit exactly once iff its
+`side` bits sum to bits 1..side all set: `side` powers of two can only add
+up to a number with `side` set bits when they are all different. Sums are
+cheaper than bitwise reductions and need no Python loop over grids.
+
+numpy is optional for the game; without it these functions raise
+ImportError, except is_valid_grid(), which falls back to the solver.
+"""
+from . import solver
+from .bank import PACKED_SIZE, RECORD_HEADER
+from .solver import SIDE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Grids per internal block, which keeps the temporaries cache-sized
+BLOCK = 1 << 12
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("sudoku.batch needs numpy (pip install numpy)")
+
+
+def as_batch(grids):
+    # Accept one grid or many, as nested lists or arrays -> (N, side, side) uint8
+    _require_numpy()
+    grids = np.asarray(grids, dtype=np.uint8)
+    if grids.ndim == 2:
+        grids = grids[None]
+    if grids.ndim != 3 or grids.shape[1] != grids.shape[2]:
+        raise ValueError(f"expected grids of shape (N, side, side), got {grids.shape}")
+    solver.geometry_for(grids.shape[1])
+    return grids
+
+
+def _unit_sums(grids):
+    # Row, column and box sums of the one-hot bits: (N, 3 * side). 9x9 sums
+    # fit in uint16; from 16x16 on the bits themselves need uint32.
+    side = grids.shape[1]
+    base = solver.geometry_for(side).base
+    dtype = np.uint16 if side < 16 else np.uint32
+    bits = np.left_shift(dtype(1), np.minimum(grids, side + 1), dtype=dtype)
+    boxes = bits.reshape(-1, base, base, base, base).swapaxes(2, 3).reshape(-1, side, side)
+    return np.concatenate((bits.sum(axis=2, dtype=dtype),
+                           bits.sum(axis=1, dtype=dtype),
+                           boxes.sum(axis=2, dtype=dtype)), axis=1)
+
+
+def valid_grids(grids):
+    # True for every grid that is a complete, valid solution
+    grids = as_batch(grids)
+    target = ((1 << grids.shape[1]) - 1) << 1  # Bits 1..side
+    out = np.empty(len(grids), dtype=bool)
+    for start in range(0, len(grids), BLOCK):
+        block = grids[start:start + BLOCK]
+        out[start:start + len(block)] = (_unit_sums(block) == target).all(axis=1)
+    return out
+
+
+def consistent(puzzles, solutions):
+    # True where the solution is valid and agrees with every clue
+    puzzles, solutions = as_batch(puzzles), as_batch(solutions)
+    if puzzles.shape != solutions.shape:
+        raise ValueError("puzzles and solutions differ in shape")
+    out = valid_grids(solutions)
+    for start in range(0, len(puzzles), BLOCK):
+        p = puzzles[start:start + BLOCK]
+        s = solutions[start:start + BLOCK]
+        out[start:start + len(p)] &= ((p == 0) | (p == s)).reshape(len(p), -1).all(axis=1)
+    return out
+
+
+def clue_counts(puzzles):
+    puzzles = as_batch(puzzles)
+    return np.count_nonzero(puzzles.reshape(len(puzzles), -1), axis=1)
+
+
+def is_valid_grid(grid):
+    # Single-grid check for callers without a Board
+    if np is None:
+        return solver.is_solved(grid)
+    return bool(valid_grids(grid)[0])
+
+
+def unpack(packed):
+    # (N, PACKED_SIZE) 4-bit packed cells, as stored in a bank -> (N, 9, 9)
+    _require_numpy()
+    packed = np.asarray(packed, dtype=np.uint8)
+    cells = np.empty((len(packed), 2 * packed.shape[1]), dtype=np.uint8)
+    cells[:, 0::2] = packed >> 4
+    cells[:, 1::2] = packed & 15
+    return cells[:, :solver.CELLS].reshape(-1, SIDE, SIDE)
+
+
+def bank_arrays(bank, level):
+    # All puzzles (and solutions, or None) of one bank level as arrays,
+    # read straight from the memory map
+    _require_numpy()
+    offset, count = bank.index[level]
+    records = np.frombuffer(bank.data, dtype=np.uint8, count=count * bank.record_size,
+                            offset=offset).reshape(count, bank.record_size)
+    start = RECORD_HEADER.size
+    puzzles = unpack(records[:, start:start + PACKED_SIZE])
+    solutions = unpack(records[:, start + PACKED_SIZE:]) if bank.has_solutions else None
+    return puzzles, solutions
@@ -0,0 +1,211 @@
+"""Compact board model with incrementally maintained occupancy masks.
+
+Cells, givens and per-unit digit counts live in bytearrays and pencil notes
+are stored as one bitmask per cell in an array ('H', or 'I' once a board has
+more than 16 digits), so a whole game state is a few hundred bytes that
+copy, hash and pickle cheaply. Every row, column and box also keeps a mask
+of the digits present, updated on each place or erase, which makes legality
+checks, conflict tests and win detection O(1) instead of rescanning the
+grid. The board's size comes from the puzzle; see solver.Geometry.
+"""
+from array import array
+
+from . import solver
+from .solver import SIDE
+
+# Digits set in each possible 9x9 note mask
+MASK_DIGITS = [tuple(solver.digits(m)) for m in range(solver.ALL + 1)]
+
+
+def _mask_type(side):
+    return "H" if side <= 16 else "I"
+
+
+class Board:
+    __slots__ = ("geo", "cells", "given", "solution", "notes", "counts", "masks",
+                 "filled", "correct", "conflicts")
+
+    def __init__(self, puzzle, solution=None):
+        geo = self.geo = solver.geometry_for(len(puzzle))
+        flat = solver.to_flat(puzzle)
+        self.cells = bytearray(geo.cells)
+        self.given = bytes(1 if v else 0 for v in flat)
+        self.solution = bytes(solver.to_flat(solution)) if solution is not None else None
+        self.notes = array(_mask_type(geo.side), [0]) * geo.cells
+        self.counts = bytearray(3 * geo.side * (geo.side + 1))  # Per unit, index 0 unused
+        self.masks = array(_mask_type(geo.side), [0]) * (3 * geo.side)
+        self.filled = 0
+        self.correct = 0
+        self.conflicts = 0  # Surplus copies of a digit summed over all units
+
+        for i, v in enumerate(flat):
+            if v:
+                self._add(i, v)
+
+    # Cheap snapshots, equality and hashing over the playable state
+
+    def copy(self):
+        other = Board.__new__(Board)
+        other.geo = self.geo
+        other.cells = self.cells[:]
+        other.given = self.given
+        other.solution = self.solution
+        other.notes = self.notes[:]
+        other.counts = self.counts[:]
+        other.masks = self.masks[:]
+        other.filled = self.filled
+        other.correct = self.correct
+        other.conflicts = self.conflicts
+        return other
+
+    def key(self):
+        return bytes(self.cells) + bytes(self.given) + self.notes.tobytes()
+
+    def __eq__(self, other):
+        if not isinstance(other, Board):
+            return NotImplemented
+        return self.cells == other.cells and self.given == other.given and self.notes == other.notes
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def to_bytes(self):
+        # base, cells, given flags, notes and (optionally) the solution
+        data = bytes([self.geo.base]) + bytes(self.cells) + bytes(self.given) + self.notes.tobytes()
+        return data + (self.solution or b"")
+
+    @classmethod
+    def from_bytes(cls, data):
+        geo = solver.geometry(data[0])
+        n = geo.cells
+        cells = data[1:1 + n]
+        given = data[1 + n:1 + 2 * n]
+        notes = array(_mask_type(geo.side))
+        notes_end = 1 + 2 * n + notes.itemsize * n
+        notes.frombytes(data[1 + 2 * n:notes_end])
+        solution = data[notes_end:notes_end + n] or None
+        puzzle = [v if g else 0 for v, g in zip(cells, given)]
+        board = cls(solver.to_grid(puzzle), solver.to_grid(solution) if solution else None)
+        for i, v in enumerate(cells):
+            if v and not given[i]:
+                board._add(i, v)
+        board.notes = notes
+        return board
+
+    def __reduce__(self):
+        return (Board.from_bytes, (self.to_bytes(),))
+
+    # Incremental bookkeeping
+
+    def _add(self, i, d):
+        bit = 1 << (d - 1)
+        counts, masks = self.counts, self.masks
+        stride = self.geo.side + 1
+        self.cells[i] = d
+        self.filled += 1
+        if self.solution is not None and self.solution[i] == d:
+            self.correct += 1
+        for unit in self.geo.cell_units[i]:
+            k = unit * stride + d
+            if counts[k]:
+                self.conflicts += 1
+            else:
+                masks[unit] |= bit
+            counts[k] += 1
+
+    def _remove(self, i):
+        d = self.cells[i]
+        bit = 1 << (d - 1)
+        counts, masks = self.counts, self.masks
+        stride = self.geo.side + 1
+        self.cells[i] = 0
+        self.filled -= 1
+        if self.solution is not None and self.solution[i] == d:
+            self.correct -= 1
+        for unit in self.geo.cell_units[i]:
+            k = unit * stride + d
+            counts[k] -= 1
+            if counts[k]:
+                self.conflicts -= 1
+            else:
+                masks[unit] &= ~bit
+
+    # Cells
+
+    def get(self, row, col):
+        return self.cells[row * self.geo.side + col]
+
+    def is_given(self, row, col):
+        return bool(self.given[row * self.geo.side + col])
+
+    def place(self, row, col, d):
+        i = row * self.geo.side + col
+        if self.given[i]:
+            return False
+        if self.cells[i]:
+            self._remove(i)
+        self._add(i, d)
+        return True
+
+    def erase(self, row, col):
+        i = row * self.geo.side + col
+        if self.given[i] or not self.cells[i]:
+            return False
+        self._remove(i)
+        return True
+
+    def is_legal(self, row, col, d):
+        # Could `d` stand in this cell without clashing with another cell?
+        i = row * self.geo.side + col
+        if self.cells[i] == d:
+            counts, stride = self.counts, self.geo.side + 1
+            return all(counts[unit * stride + d] == 1 for unit in self.geo.cell_units[i])
+        r, c, b = self.geo.cell_units[i]
+        masks = self.masks
+        return not (masks[r] | masks[c] | masks[b]) & (1 << (d - 1))
+
+    def has_conflict(self, row, col):
+        d = self.get(row, col)
+        return bool(d) and not self.is_legal(row, col, d)
+
+    def peers(self, row, col):
+        side = self.geo.side
+        return [divmod(j, side) for j in self.geo.peers[row * side + col]]
+
+    def solution_at(self, row, col):
+        return self.solution[row * self.geo.side + col]
+
+    def is_solved(self):
+        return self.filled == self.geo.cells and self.conflicts == 0
+
+    # Pencil notes, one bitmask per cell
+
+    def notes_mask(self, row, col):
+        return self.notes[row * self.geo.side + col]
+
+    def note_digits(self, row, col):
+        side = self.geo.side
+        mask = self.notes[row * side + col]
+        if side == SIDE:
+            return MASK_DIGITS[mask]
+        return tuple(solver.digits(mask, side))
+
+    def has_note(self, row, col, d):
+        return bool(self.notes[row * self.geo.side + col] >> (d - 1) & 1)
+
+    def toggle_note(self, row, col, d):
+        self.notes[row * self.geo.side + col] ^= 1 << (d - 1)
+
+    def set_notes(self, row, col, mask):
+        self.notes[row * self.geo.side + col] = mask
+
+    def clear_notes(self, row, col):
+        self.notes[row * self.geo.side + col] = 0
+
+    # Grid views
+
+    def to_grid(self):
+        return solver.to_grid(self.cells)
+
+    def givens_grid(self):
+        return solver.to_grid([v if g else 0 for v, g in zip(self.cells, self.given)])
@@ -0,0 +1,143 @@
+"""Symmetry-canonical form and 64-bit hash of a puzzle.
+
+Two puzzles are the same game in disguise when one turns into the other by
+permuting bands, stacks, rows within a band or columns within a stack,
+transposing, and relabeling digits. canonical_form() picks one
+representative of each such class: the transform whose cells, read row by
+row with digits renumbered in order of first appearance, are
+lexicographically smallest (empty cells are 0, so they sort first).
+puzzle_hash() digests that form into 64 bits that are stable across
+processes, so millions of puzzles can be deduplicated with a set of ints.
+
+The number of transforms to try grows factorially with the box size, so
+16x16 boards can take seconds and 25x25 boards do not finish. dedup_hash()
+is what the game's puzzle sources use: the canonical hash up to
+CANONICAL_MAX_BASE, and a plain hash of the cells above it, which only
+catches exact repeats.
+
+The search fixes the output one row at a time and only keeps the partial
+transforms that tie for the smallest rows so far. Renumbered, any row reads
+as its empty cells and 1, 2, 3... in order, so the smallest first row is
+decided by where the empty cells are: emptiest stacks first, empty cells
+first inside each stack. That leaves few column orders to try.
+"""
+import hashlib
+import math
+from itertools import permutations, product
+
+from . import solver
+
+# Largest box size whose puzzles are hashed by canonical form in dedup_hash()
+CANONICAL_MAX_BASE = 3
+
+
+def _first_row(values, base):
+    # Shape of the smallest first row for a row holding `values`: empty
+    # cells per stack, emptiest stack first. The largest shape gives the
+    # smallest row.
+    return sorted((sum(1 for v in values[s * base:(s + 1) * base] if not v) for s in range(base)),
+                  reverse=True)
+
+
+def _column_orders(values, base):
+    # Every column order that puts `values` in its smallest form
+    stacks = [range(s * base, (s + 1) * base) for s in range(base)]
+    empty = [sum(1 for c in stack if not values[c]) for stack in stacks]
+
+    # Stacks with the same number of empty cells may come in any order
+    groups = {}
+    for s in range(base):
+        groups.setdefault(empty[s], []).append(s)
+    stack_orders = [sum(combo, ()) for combo in
+                    product(*(permutations(groups[n]) for n in sorted(groups, reverse=True)))]
+
+    inside = []
+    for stack in stacks:
+        holes = [c for c in stack if not values[c]]
+        clues = [c for c in stack if values[c]]
+        inside.append([h + k for h in permutations(holes) for k in permutations(clues)])
+
+    for order in stack_orders:
+        for cols in product(*(inside[s] for s in order)):
+            yield sum(cols, ())
+
+
+def _relabel(row, cols, labels, next_label, bound=None):
+    # The row read in column order with digits renumbered; `labels` is
+    # updated in place and the next free label returned. Gives up with
+    # (None, next_label) as soon as the row gets larger than `bound`.
+    out = []
+    tied = bound is not None
+    for c in cols:
+        v = row[c]
+        if v:
+            if not labels[v]:
+                labels[v] = next_label
+                next_label += 1
+            v = labels[v]
+        if tied:
+            b = bound[len(out)]
+            if v > b:
+                return None, next_label
+            tied = v == b
+        out.append(v)
+    return out, next_label
+
+
+def canonical_form(grid):
+    # The smallest equivalent puzzle as flat cells in bytes
+    side = len(grid)
+    base = math.isqrt(side)
+    solver.geometry_for(side)
+    rows = [list(row) for row in grid]
+    grids = (rows, [list(col) for col in zip(*rows)])
+
+    # First row: any row of either orientation, in its smallest form
+    smallest = max(_first_row(g[r], base) for g in grids for r in range(side))
+    states = []
+    for g in grids:
+        for r in range(side):
+            if _first_row(g[r], base) != smallest:
+                continue
+            for cols in _column_orders(g[r], base):
+                labels = [0] * (side + 1)
+                first, next_label = _relabel(g[r], cols, labels, 1)
+                states.append((g, (r,), cols, labels, next_label))
+    out = first  # The same for every state
+
+    # Later rows: finish the current band, then start any unused band
+    for depth in range(1, side):
+        best, kept = None, []
+        for g, used, cols, labels, next_label in states:
+            if depth % base:
+                band = used[-1] // base
+                choices = [r for r in range(band * base, (band + 1) * base) if r not in used]
+            else:
+                bands = {r // base for r in used}
+                choices = [r for r in range(side) if r // base not in bands]
+            for r in choices:
+                trial = labels[:]
+                row, trial_next = _relabel(g[r], cols, trial, next_label, best)
+                if row is None:
+                    continue  # Already larger than the best row
+                if best is None or row < best:
+                    best, kept = row, []
+                kept.append((g, used + (r,), cols, trial, trial_next))
+        states = kept
+        out += best
+    return bytes(out)
+
+
+def puzzle_hash(grid):
+    # 64-bit hash of the canonical form; equal for equivalent puzzles
+    digest = hashlib.blake2b(canonical_form(grid), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def dedup_hash(grid):
+    # 64-bit hash for deduplication whose cost stays bounded on every size
+    if math.isqrt(len(grid)) <= CANONICAL_MAX_BASE:
+        return puzzle_hash(grid)
+    cells = bytes(v for row in grid for v in row)
+    digest = hashlib.blake2b(cells, digest_size=8).digest()
+    return int.from_bytes(digest, "little")
@@ -0,0 +1,208 @@
+"""Command-line batch mode: python -m sudoku.
+
+Puzzles are read one per line as 81 characters (digits, with 0 or . for
+empty cells) from a file or stdin, pushed through the requested stages and
+written to stdout as tab-separated lines as soon as they are ready:
+
+    python -m sudoku validate,solve,grade corpus.txt --jobs 8
+    python -m sudoku generate --count 1000 --jobs 8 > puzzles.txt
+
+Input is read in chunks and at most a few chunks per worker are in flight,
+so memory stays bounded however long the input is. With --unordered,
+results are written in completion order instead of input order.
+"""
+import argparse
+import random
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from . import solver
+from .core import DIFFICULTY_LEVELS
+from .generator import generate_board
+from .grader import grade
+
+STAGES = ("validate", "solve", "grade")
+
+# Lines per task and tasks in flight per worker
+CHUNK_SIZE = 256
+WINDOW_PER_JOB = 2
+
+
+def parse_line(line):
+    # 81-char puzzle string -> flat list of ints, or None if malformed
+    line = line.strip()
+    if len(line) != solver.CELLS:
+        return None
+    cells = []
+    for ch in line:
+        if ch in "0.":
+            cells.append(0)
+        elif "1" <= ch <= "9":
+            cells.append(int(ch))
+        else:
+            return None
+    return cells
+
+
+def format_cells(cells):
+    return "".join(str(v) for v in cells)
+
+
+def process_line(line, stages):
+    # One output line: the puzzle followed by one field per stage
+    cells = parse_line(line)
+    grid = solver.to_grid(cells) if cells is not None else None
+    fields = [line.strip()]
+    for stage in stages:
+        if grid is None:
+            fields.append({"validate": "invalid", "grade": "-\t-"}.get(stage, "-"))
+        elif stage == "validate":
+            fields.append(("unsolvable", "unique", "multiple")[solver.count_solutions(grid, limit=2)])
+        elif stage == "solve":
+            solution = solver.solve(grid)
+            fields.append(format_cells(solver.to_flat(solution)) if solution else "-")
+        elif stage == "grade":
+            result = grade(grid)
+            fields.append(f"{result.rating:.1f}\t{result.hardest or '-'}")
+    return "\t".join(fields)
+
+
+def process_chunk(lines, stages):
+    return [process_line(line, stages) for line in lines]
+
+
+def generate_chunk(level, seed, start, count):
+    # Each puzzle gets its own RNG so output doesn't depend on --jobs
+    lines = []
+    for index in range(start, start + count):
+        rng = random.Random(f"{seed}:{level}:{index}")
+        board, solution = generate_board(level, rng)
+        rating = grade(board).rating
+        lines.append(f"{format_cells(solver.to_flat(board))}\t{format_cells(solver.to_flat(solution))}"
+                     f"\t{DIFFICULTY_LEVELS[level]}\t{rating:.1f}")
+    return lines
+
+
+def run_tasks(tasks, jobs, ordered=True):
+    # Yield the results of (fn, *args) tasks, keeping at most
+    # jobs * WINDOW_PER_JOB of them submitted at a time
+    if jobs <= 1:
+        for fn, *args in tasks:
+            yield fn(*args)
+        return
+
+    window = jobs * WINDOW_PER_JOB
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        in_flight = deque()
+        for fn, *args in tasks:
+            in_flight.append(executor.submit(fn, *args))
+            if len(in_flight) < window:
+                continue
+            if ordered:
+                yield in_flight.popleft().result()
+            else:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.remove(future)
+                    yield future.result()
+        if ordered:
+            while in_flight:
+                yield in_flight.popleft().result()
+        else:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.remove(future)
+                    yield future.result()
+
+
+def _read_chunks(stream, size):
+    lines = (line for line in stream if line.strip() and not line.startswith("#"))
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _generate_tasks(levels, count, seed, size):
+    for level in levels:
+        for start in range(0, count, size):
+            yield generate_chunk, level, seed, start, min(size, count - start)
+
+
+def cmd_process(args, out):
+    stages = args.stages
+    if args.input in (None, "-"):
+        stream = sys.stdin
+    else:
+        stream = open(args.input)
+    try:
+        tasks = ((process_chunk, chunk, stages) for chunk in _read_chunks(stream, args.chunk_size))
+        for lines in run_tasks(tasks, args.jobs, not args.unordered):
+            out.write("\n".join(lines) + "\n")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def cmd_generate(args, out):
+    levels = args.difficulty or list(range(len(DIFFICULTY_LEVELS)))
+    if args.seed is None:
+        # A fresh corpus every run, reproducible with the seed reported here
+        args.seed = str(random.getrandbits(63))
+        print(f"seed: {args.seed}", file=sys.stderr)
+    # Generation is slow per puzzle, so small chunks keep all workers busy
+    size = max(1, min(args.chunk_size, args.count // (args.jobs * WINDOW_PER_JOB) or 1))
+    tasks = _generate_tasks(levels, args.count, args.seed, size)
+    for lines in run_tasks(tasks, args.jobs, not args.unordered):
+        out.write("\n".join(lines) + "\n")
+        out.flush()
+
+
+def _stages(value):
+    stages = value.split(",")
+    for stage in stages:
+        if stage not in STAGES:
+            raise argparse.ArgumentTypeError(f"unknown stage {stage!r} (choose from {', '.join(STAGES)})")
+    return stages
+
+
+def _difficulty(value):
+    names = [name.lower() for name in DIFFICULTY_LEVELS]
+    if value.lower() in names:
+        return names.index(value.lower())
+    if value.isdigit() and int(value) < len(names):
+        return int(value)
+    raise argparse.ArgumentTypeError(f"unknown difficulty {value!r}")
+
+
+def main(argv=None, out=None):
+    out = out or sys.stdout
+    parser = argparse.ArgumentParser(prog="python -m sudoku", description=__doc__.splitlines()[0])
+    parser.add_argument("command", help="'generate', or comma-separated stages: validate, solve, grade")
+    parser.add_argument("input", nargs="?", help="puzzle file, one per line (default: stdin)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="worker processes")
+    parser.add_argument("--unordered", action="store_true", help="write results as they complete")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="lines per worker task")
+    parser.add_argument("--count", "-n", type=int, default=10, help="generate: puzzles per difficulty")
+    parser.add_argument("--difficulty", "-d", type=_difficulty, action="append",
+                        help="generate: difficulty name or index (repeatable, default all)")
+    parser.add_argument("--seed", help="generate: seed for reproducible output (default: random, printed to stderr)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "generate":
+            cmd_generate(args, out)
+        else:
+            try:
+                args.stages = _stages(args.command)
+            except argparse.ArgumentTypeError as e:
+                parser.error(str(e))
+            cmd_process(args, out)
+    except BrokenPipeError:
+        # Output piped into head and friends
+        sys.stderr.close()
+    return 0
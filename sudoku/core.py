@@ -0,0 +1,57 @@
+"""Board rules shared by the pygame front end, worker processes and tools.
+
+Boards are board.Board models, which also hold the pencil notes.
+Nothing here imports pygame.
+"""
+from .board import Board
+
+DIFFICULTY_LEVELS = ["Easy", "Medium", "Hard", "Expert"]
+HINTS_PER_GAME = 3
+
+
+def new_board(puzzle, solution=None):
+    return Board(puzzle, solution)
+
+
+def check_win(board):
+    # Givens can't be edited, so any complete grid without conflicts solves
+    # the puzzle. O(1) for a Board thanks to its running counters; plain
+    # grids go through the batch validator.
+    if isinstance(board, Board):
+        return board.is_solved()
+    from . import batch
+    return batch.is_valid_grid(board)
+
+
+def enter_number(board, row, col, num, pencil_mode):
+    # Number pad / keyboard entry. In pencil mode the note is toggled,
+    # otherwise the digit is toggled and the cell's notes are cleared.
+    # Returns True if the cell changed.
+    if board.is_given(row, col):
+        return False
+    if pencil_mode:
+        board.toggle_note(row, col, num)
+    else:
+        if board.get(row, col) == num:
+            board.erase(row, col)
+        else:
+            board.place(row, col, num)
+            board.clear_notes(row, col)  # Clear notes when entering a number
+    return True
+
+
+def clear_cell(board, row, col):
+    if board.is_given(row, col):
+        return False
+    board.erase(row, col)
+    board.clear_notes(row, col)
+    return True
+
+
+def apply_hint(board, row, col):
+    # Reveal the solution digit in an empty cell
+    if board.get(row, col) != 0:
+        return False
+    board.place(row, col, board.solution_at(row, col))
+    board.clear_notes(row, col)
+    return True
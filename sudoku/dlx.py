@@ -0,0 +1,221 @@
+"""Exact-cover (Algorithm X with Dancing Links) solver with lazy enumeration.
+
+A BASE^2 x BASE^2 Sudoku is an exact-cover problem with one matrix row per
+(cell, digit) choice and 4 * side^2 constraint columns: every cell holds a
+digit, and every row, column and box holds every digit once (324 columns
+on 9x9). The matrix is built once per size as flat link arrays. A puzzle's
+givens are applied by covering their columns, and everything is uncovered
+again when the enumeration ends, so one structure serves puzzle after
+puzzle without being rebuilt.
+
+solutions() is a generator: callers take as many solutions as they need,
+or count them one by one on boards with millions. The bitmask solver in
+solver.py stays the faster choice for a single solution or a uniqueness
+check on a well-formed puzzle.
+"""
+import threading
+
+from . import solver
+
+
+class ExactCover:
+    # Link arrays for one board size. Node 0 is the root, 1..columns are the
+    # column headers and every choice row adds four nodes.
+    def __init__(self, base=solver.BASE):
+        geo = solver.geometry(base)
+        side, cells = geo.side, geo.cells
+        self.geo = geo
+        self.columns = columns = 4 * cells
+        count = 1 + columns + 4 * cells * side
+        self.left = L = list(range(-1, count - 1))
+        self.right = R = list(range(1, count + 1))
+        self.up = U = list(range(count))
+        self.down = D = list(range(count))
+        self.column = C = list(range(count))
+        self.size = [0] * (1 + columns)
+        self.choice = [0] * count  # Matrix row of each node: cell * side + digit - 1
+        self.first = []  # First node of each matrix row
+
+        # Root and headers form a circular list
+        L[0], R[columns] = columns, 0
+
+        node = 1 + columns
+        for i in range(cells):
+            r, c, b = geo.row[i], geo.col[i], geo.box[i]
+            for d in range(side):
+                self.first.append(node)
+                heads = (1 + i, 1 + cells + r * side + d, 1 + 2 * cells + c * side + d,
+                         1 + 3 * cells + b * side + d)
+                for k, head in enumerate(heads):
+                    n = node + k
+                    C[n] = head
+                    self.choice[n] = i * side + d
+                    # Append at the bottom of the column
+                    U[n], D[n] = U[head], head
+                    D[U[head]] = n
+                    U[head] = n
+                    self.size[head] += 1
+                    L[n] = node + (k - 1) % 4
+                    R[n] = node + (k + 1) % 4
+                node += 4
+
+    def _cover(self, c):
+        L, R, U, D, C, S = self.left, self.right, self.up, self.down, self.column, self.size
+        R[L[c]], L[R[c]] = R[c], L[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                D[U[j]], U[D[j]] = D[j], U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, c):
+        L, R, U, D, C, S = self.left, self.right, self.up, self.down, self.column, self.size
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[c]] = L[R[c]] = c
+
+    def solutions(self, cells):
+        # Yield each solution of the flat puzzle `cells` as a new flat list.
+        # The structure is restored when the generator finishes or is closed.
+        geo = self.geo
+        side = geo.side
+        if len(cells) != geo.cells:
+            raise ValueError(f"expected {geo.cells} cells, got {len(cells)}")
+        R, D, C, S = self.right, self.down, self.column, self.size
+        covered = []
+        stack = []
+        try:
+            # Givens: cover their columns; a clash means no solutions
+            for i, v in enumerate(cells):
+                if not v:
+                    continue
+                if not 0 < v <= side:
+                    return
+                node = self.first[i * side + v - 1]
+                heads = [C[node + k] for k in range(4)]
+                if any(R[self.left[h]] != h for h in heads):
+                    return  # A column is already covered
+                for h in heads:
+                    self._cover(h)
+                    covered.append(h)
+
+            out = list(cells)
+            while True:
+                if R[0] == 0:
+                    for node in stack:
+                        choice = self.choice[node]
+                        out[choice // side] = choice % side + 1
+                    yield out[:]
+                else:
+                    # Branch on the column with the fewest rows left
+                    c, best = R[0], S[R[0]]
+                    j = R[c]
+                    while j and best > 1:
+                        if S[j] < best:
+                            c, best = j, S[j]
+                        j = R[j]
+                    if best:
+                        self._cover(c)
+                        r = D[c]
+                        stack.append(r)
+                        j = R[r]
+                        while j != r:
+                            self._cover(C[j])
+                            j = R[j]
+                        continue
+
+                # Backtrack to the next untried row
+                while stack:
+                    r = stack.pop()
+                    j = self.left[r]
+                    while j != r:
+                        self._uncover(C[j])
+                        j = self.left[j]
+                    c = C[r]
+                    r = D[r]
+                    if r != c:
+                        stack.append(r)
+                        j = R[r]
+                        while j != r:
+                            self._cover(C[j])
+                            j = R[j]
+                        break
+                    self._uncover(c)
+                else:
+                    return
+        finally:
+            # Unwind whatever is still covered, deepest first
+            while stack:
+                r = stack.pop()
+                j = self.left[r]
+                while j != r:
+                    self._uncover(C[j])
+                    j = self.left[j]
+                self._uncover(C[r])
+            for h in reversed(covered):
+                self._uncover(h)
+
+
+# Idle structures per base. Each enumeration borrows one, so concurrent
+# generators (or threads) never share links.
+_free = {}
+_lock = threading.Lock()
+
+
+def _acquire(base):
+    with _lock:
+        spare = _free.get(base)
+        if spare:
+            return spare.pop()
+    return ExactCover(base)
+
+
+def _release(matrix):
+    with _lock:
+        _free.setdefault(matrix.geo.base, []).append(matrix)
+
+
+def solutions(grid, limit=None):
+    # Lazily yield the solutions of `grid` as grids, at most `limit` of them
+    geo = solver.geometry_for(len(grid))
+    matrix = _acquire(geo.base)
+    found = 0
+    try:
+        for cells in matrix.solutions(solver.to_flat(grid)):
+            yield solver.to_grid(cells)
+            found += 1
+            if limit is not None and found >= limit:
+                return
+    finally:
+        _release(matrix)
+
+
+def count_solutions(grid, limit=None):
+    # Count solutions, stopping at `limit` if one is given
+    geo = solver.geometry_for(len(grid))
+    matrix = _acquire(geo.base)
+    found = 0
+    try:
+        enumeration = matrix.solutions(solver.to_flat(grid))
+        for _ in enumeration:
+            found += 1
+            if limit is not None and found >= limit:
+                break
+        enumeration.close()
+    finally:
+        _release(matrix)
+    return found
+
+
+def solve(grid):
+    # One solution as a grid, or None
+    return next(solutions(grid, 1), None)
@@ -0,0 +1,85 @@
+"""Puzzle generator that only ever produces boards with a unique solution."""
+import random
+
+from . import solver
+from .grader import STUCK_RATING, grade
+
+# Cells to remove per difficulty index (Easy, Medium, Hard, Expert) on a 9x9
+# board; other sizes remove the same share of their cells. Hard and Expert
+# dig as far as uniqueness allows; their difficulty comes from the rating
+# band below, not from the clue count.
+CELLS_TO_REMOVE = {
+    0: 30,
+    1: 50,
+    2: solver.CELLS,
+    3: solver.CELLS,
+}
+
+# Accepted grader ratings per difficulty (inclusive)
+RATING_BANDS = {
+    0: (0.0, 1.5),           # Hidden singles only
+    1: (1.6, 2.3),           # Needs a naked single
+    2: (2.6, 3.4),           # Locked candidates, pairs, X-Wing
+    3: (3.6, STUCK_RATING),  # Triples, Swordfish, chains and beyond
+}
+
+# Puzzles generated before settling for the closest rating
+MAX_ATTEMPTS = 30
+
+# 16x16 and 25x25 boards: past this share of empty cells, proving uniqueness
+# turns from milliseconds into minutes per cell. Each difficulty digs a
+# fraction of that cap instead of going for a minimal puzzle.
+MAX_HOLE_SHARE = {4: 0.56, 5: 0.48}
+LARGE_BOARD_DIFFICULTY = {0: 0.65, 1: 0.8, 2: 0.9, 3: 1.0}
+
+
+def holes_for(difficulty, base=solver.BASE):
+    cells = solver.geometry(base).cells
+    if base in MAX_HOLE_SHARE:
+        return int(cells * MAX_HOLE_SHARE[base] * LARGE_BOARD_DIFFICULTY[difficulty])
+    return min(cells, CELLS_TO_REMOVE[difficulty] * cells // solver.CELLS)
+
+
+def generate_puzzle(holes, rng=random, base=solver.BASE):
+    # Dig holes into a random full grid one clue at a time. A clue is only
+    # removed if the puzzle still has exactly one solution; the counter stops
+    # at two so rejected removals are cheap. If the grid becomes minimal
+    # before `holes` cells are empty, the puzzle is returned as it is.
+    solution = solver.random_solution(rng, base)
+    board = [row[:] for row in solution]
+    side = len(board)
+
+    cells = list(range(side * side))
+    rng.shuffle(cells)
+
+    removed = 0
+    for i in cells:
+        if removed >= holes:
+            break
+        r, c = divmod(i, side)
+        value = board[r][c]
+        board[r][c] = 0
+        if solver.count_solutions(board, limit=2) == 1:
+            removed += 1
+        else:
+            board[r][c] = value
+
+    return board, solution
+
+
+def generate_board(difficulty, rng=random, base=solver.BASE):
+    # Generate puzzles until one is rated inside the difficulty's band. The
+    # bands are calibrated for 9x9, so other sizes go by clue count alone.
+    if base != solver.BASE:
+        return generate_puzzle(holes_for(difficulty, base), rng, base)
+    low, high = RATING_BANDS[difficulty]
+    best, best_distance = None, None
+    for _ in range(MAX_ATTEMPTS):
+        board, solution = generate_puzzle(CELLS_TO_REMOVE[difficulty], rng)
+        rating = grade(board).rating
+        if low <= rating <= high:
+            return board, solution
+        distance = low - rating if rating < low else rating - high
+        if best is None or distance < best_distance:
+            best, best_distance = (board, solution), distance
+    return best
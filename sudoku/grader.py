@@ -0,0 +1,332 @@
+"""Human-technique difficulty grader.
+
+The puzzle is solved the way a person would: the simplest technique that
+makes progress is applied, then the search restarts from the simplest one.
+The rating is the weight of the hardest technique needed, on a scale close
+to Sudoku Explainer's. Puzzles that need more than the techniques below get
+STUCK_RATING.
+"""
+import math
+from collections import namedtuple
+from itertools import combinations
+
+from . import solver
+
+Grade = namedtuple("Grade", "rating hardest steps solved")
+
+STUCK_RATING = 7.0
+STUCK_TECHNIQUE = "Trial and error"
+
+
+class _Grid:
+    # `because` holds the cells that justified the last elimination, for
+    # hints to point at
+    __slots__ = ("cells", "cand", "geo", "because")
+
+    def __init__(self, cells):
+        geo = self.geo = solver.geometry_for(math.isqrt(len(cells)))
+        ROW, COL, BOX = geo.row, geo.col, geo.box
+        self.cells = list(cells)
+        self.cand = [0] * geo.cells
+        self.because = ()
+        rows, cols, boxes = [0] * geo.side, [0] * geo.side, [0] * geo.side
+        for i, v in enumerate(self.cells):
+            if v:
+                bit = 1 << (v - 1)
+                rows[ROW[i]] |= bit
+                cols[COL[i]] |= bit
+                boxes[BOX[i]] |= bit
+        for i, v in enumerate(self.cells):
+            if not v:
+                self.cand[i] = geo.all & ~(rows[ROW[i]] | cols[COL[i]] | boxes[BOX[i]])
+
+    def copy(self):
+        other = _Grid.__new__(_Grid)
+        other.cells = self.cells[:]
+        other.cand = self.cand[:]
+        other.geo = self.geo
+        other.because = ()
+        return other
+
+    # Row, column and box units
+    @property
+    def row_units(self):
+        return self.geo.units[:self.geo.side]
+
+    @property
+    def col_units(self):
+        return self.geo.units[self.geo.side:2 * self.geo.side]
+
+    @property
+    def box_units(self):
+        return self.geo.units[2 * self.geo.side:]
+
+    def place(self, i, d):
+        bit = 1 << (d - 1)
+        self.cells[i] = d
+        self.cand[i] = 0
+        cand = self.cand
+        for p in self.geo.peers[i]:
+            cand[p] &= ~bit
+
+    def eliminate(self, cells, mask, because=()):
+        # Remove `mask` from the given cells; True if anything changed
+        changed = False
+        cand = self.cand
+        for i in cells:
+            if cand[i] & mask:
+                cand[i] &= ~mask
+                changed = True
+        if changed:
+            self.because = tuple(because)
+        return changed
+
+
+def _positions(grid, unit, bit):
+    return [i for i in unit if grid.cand[i] & bit]
+
+
+def naked_single(grid):
+    found = False
+    for i in range(grid.geo.cells):
+        m = grid.cand[i]
+        if m and m & (m - 1) == 0:
+            grid.place(i, grid.geo.bit[m])
+            found = True
+    return found
+
+
+def hidden_single(grid):
+    found = False
+    cand = grid.cand
+    for unit in grid.geo.units:
+        once = twice = 0
+        for i in unit:
+            m = cand[i]
+            twice |= once & m
+            once |= m
+        singles = once & ~twice
+        while singles:
+            bit = singles & -singles
+            singles ^= bit
+            for i in unit:
+                if cand[i] & bit:
+                    grid.place(i, grid.geo.bit[bit])
+                    found = True
+                    break
+    return found
+
+
+def _locked(grid, units, line_of, lines):
+    # Digits confined to one line inside a unit are removed from the rest of
+    # that line
+    for unit in units:
+        for d in range(grid.geo.side):
+            bit = 1 << d
+            cells = _positions(grid, unit, bit)
+            if len(cells) < 2:
+                continue
+            line = line_of[cells[0]]
+            if all(line_of[i] == line for i in cells[1:]):
+                others = [i for i in lines[line] if i not in cells]
+                if grid.eliminate(others, bit, unit):
+                    return True
+    return False
+
+
+def pointing(grid):
+    geo = grid.geo
+    return (_locked(grid, grid.box_units, geo.row, grid.row_units) or
+            _locked(grid, grid.box_units, geo.col, grid.col_units))
+
+
+def claiming(grid):
+    geo = grid.geo
+    return (_locked(grid, grid.row_units, geo.box, grid.box_units) or
+            _locked(grid, grid.col_units, geo.box, grid.box_units))
+
+
+def _naked_subset(grid, size):
+    cand = grid.cand
+    POPCOUNT = grid.geo.popcount
+    for unit in grid.geo.units:
+        cells = [i for i in unit if cand[i] and POPCOUNT[cand[i]] <= size]
+        if len(cells) < size:
+            continue
+        for combo in combinations(cells, size):
+            union = 0
+            for i in combo:
+                union |= cand[i]
+            if POPCOUNT[union] == size:
+                others = [i for i in unit if i not in combo]
+                if grid.eliminate(others, union, combo):
+                    return True
+    return False
+
+
+def _hidden_subset(grid, size):
+    cand = grid.cand
+    for unit in grid.geo.units:
+        where = {}
+        for d in range(grid.geo.side):
+            cells = _positions(grid, unit, 1 << d)
+            if 2 <= len(cells) <= size:
+                where[d] = cells
+        if len(where) < size:
+            continue
+        for digits in combinations(where, size):
+            cells = set()
+            for d in digits:
+                cells.update(where[d])
+            if len(cells) != size:
+                continue
+            keep = 0
+            for d in digits:
+                keep |= 1 << d
+            changed = False
+            for i in cells:
+                if cand[i] & ~keep:
+                    cand[i] &= keep
+                    changed = True
+            if changed:
+                grid.because = tuple(cells)
+                return True
+    return False
+
+
+def naked_pair(grid):
+    return _naked_subset(grid, 2)
+
+
+def naked_triple(grid):
+    return _naked_subset(grid, 3)
+
+
+def hidden_pair(grid):
+    return _hidden_subset(grid, 2)
+
+
+def hidden_triple(grid):
+    return _hidden_subset(grid, 3)
+
+
+def _fish(grid, size):
+    geo = grid.geo
+    for bases, covers, cover_of in ((grid.row_units, grid.col_units, geo.col),
+                                    (grid.col_units, grid.row_units, geo.row)):
+        for d in range(geo.side):
+            bit = 1 << d
+            lines = []
+            for base in bases:
+                cells = _positions(grid, base, bit)
+                if 2 <= len(cells) <= size:
+                    lines.append((base, {cover_of[i] for i in cells}))
+            if len(lines) < size:
+                continue
+            for combo in combinations(lines, size):
+                cover_lines = set()
+                for _, covered in combo:
+                    cover_lines |= covered
+                if len(cover_lines) != size:
+                    continue
+                base_cells = set()
+                for base, _ in combo:
+                    base_cells.update(base)
+                others = [i for c in cover_lines for i in covers[c] if i not in base_cells]
+                if grid.eliminate(others, bit, base_cells):
+                    return True
+    return False
+
+
+def x_wing(grid):
+    return _fish(grid, 2)
+
+
+def swordfish(grid):
+    return _fish(grid, 3)
+
+
+def simple_coloring(grid):
+    # Single-digit chains built from conjugate pairs (units where a digit has
+    # exactly two places). Two cells of the same color seeing each other make
+    # that color false; a cell seeing both colors can't hold the digit.
+    cand = grid.cand
+    PEERS = grid.geo.peers
+    for d in range(grid.geo.side):
+        bit = 1 << d
+        links = {}
+        for unit in grid.geo.units:
+            cells = _positions(grid, unit, bit)
+            if len(cells) == 2:
+                a, b = cells
+                links.setdefault(a, set()).add(b)
+                links.setdefault(b, set()).add(a)
+
+        seen = set()
+        for start in links:
+            if start in seen:
+                continue
+            color = {start: 0}
+            stack = [start]
+            while stack:
+                i = stack.pop()
+                for j in links[i]:
+                    if j not in color:
+                        color[j] = 1 - color[i]
+                        stack.append(j)
+            seen.update(color)
+            if len(color) < 4:
+                continue
+            groups = ([i for i in color if color[i] == 0], [i for i in color if color[i] == 1])
+
+            # Color wrap
+            for group in groups:
+                members = set(group)
+                if any(members.intersection(PEERS[i]) for i in group):
+                    if grid.eliminate(group, bit, color):
+                        return True
+
+            # Color trap
+            seen_by = [set(), set()]
+            for k, group in enumerate(groups):
+                for i in group:
+                    seen_by[k].update(PEERS[i])
+            others = [i for i in seen_by[0] & seen_by[1] if i not in color and cand[i] & bit]
+            if grid.eliminate(others, bit, color):
+                return True
+    return False
+
+
+# Ordered from simplest to hardest: (name, rating, technique)
+TECHNIQUES = [
+    ("Hidden Single", 1.5, hidden_single),
+    ("Naked Single", 2.3, naked_single),
+    ("Pointing", 2.6, pointing),
+    ("Claiming", 2.8, claiming),
+    ("Naked Pair", 3.0, naked_pair),
+    ("X-Wing", 3.2, x_wing),
+    ("Hidden Pair", 3.4, hidden_pair),
+    ("Naked Triple", 3.6, naked_triple),
+    ("Swordfish", 3.8, swordfish),
+    ("Hidden Triple", 4.0, hidden_triple),
+    ("Simple Coloring", 4.5, simple_coloring),
+]
+
+
+def grade(puzzle):
+    # Rate a puzzle; returns Grade(rating, hardest, steps, solved). The
+    # weights are calibrated for 9x9 boards.
+    grid = _Grid(solver.to_flat(puzzle))
+    rating = 0.0
+    hardest = None
+    steps = 0
+    while 0 in grid.cells:
+        for name, weight, technique in TECHNIQUES:
+            if technique(grid):
+                steps += 1
+                if weight > rating:
+                    rating, hardest = weight, name
+                break
+        else:
+            return Grade(STUCK_RATING, STUCK_TECHNIQUE, steps, False)
+    return Grade(rating, hardest, steps, True)
@@ -0,0 +1,209 @@
+"""Logical next-step hints for a game in progress.
+
+find_hint() looks at the board as the player sees it: givens, their own
+entries and their pencil notes. Mistakes are reported first, then the
+simplest grader technique that makes progress is described, and only if
+none applies is a solution digit offered. An elimination alone leaves the
+player nothing to enter, so the search keeps going on a scratch copy until
+a digit can be placed, and the hint names every technique on the way and
+highlights the cells each one relied on. HintEngine runs the search on a
+worker thread and caches the answer per board state.
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import solver
+from .grader import TECHNIQUES, _Grid
+from .solver import symbol
+
+# cells are flat indexes to highlight; placement is (cell, digit) or None;
+# eliminations are (cell, mask) pairs
+Hint = namedtuple("Hint", "technique message cells placement eliminations")
+
+MISTAKE = "Mistake"
+REVEAL = "Reveal"
+
+# Board states remembered by a HintEngine
+HINT_CACHE_LIMIT = 64
+
+
+def _where(i, side):
+    row, col = divmod(i, side)
+    return f"row {row + 1}, column {col + 1}"
+
+
+def _mistakes(board):
+    cells, given, solution = board.cells, board.given, board.solution
+    side, n = board.geo.side, board.geo.cells
+    if solution is None:
+        wrong = [i for i in range(n) if board.has_conflict(*divmod(i, side)) and not given[i]]
+    else:
+        wrong = [i for i in range(n) if cells[i] and not given[i] and cells[i] != solution[i]]
+    if wrong:
+        if len(wrong) == 1:
+            message = f"The {symbol(cells[wrong[0]])} in {_where(wrong[0], side)} is wrong"
+            return Hint(MISTAKE, message, tuple(wrong), None, ())
+        return Hint(MISTAKE, f"{len(wrong)} entries are wrong", tuple(wrong), None, ())
+
+    if solution is not None:
+        # Notes that leave out the answer would make every later step unsound
+        notes = board.notes
+        missing = [i for i in range(n) if not cells[i] and notes[i] and not notes[i] >> (solution[i] - 1) & 1]
+        if missing:
+            message = f"Your notes in {_where(missing[0], side)} rule out the answer"
+            return Hint(MISTAKE, message, tuple(missing), None, ())
+    return None
+
+
+def _describe(name, before, after):
+    geo = before.geo
+    placed = [i for i in range(geo.cells) if after.cells[i] and not before.cells[i]]
+    if placed:
+        # Singles fill several cells at once; the first one is enough
+        i = placed[0]
+        d = after.cells[i]
+        cells = (i,)
+        if name == "Hidden Single":
+            # Highlight the unit where the digit has no other place
+            bit = 1 << (d - 1)
+            for unit in geo.units:
+                if i in unit and [j for j in unit if before.cand[j] & bit] == [i]:
+                    cells = tuple(unit)
+                    break
+        return Hint(name, f"{name}: {symbol(d)} goes in {_where(i, geo.side)}", cells, (i, d), ())
+
+    eliminations = tuple((i, before.cand[i] & ~after.cand[i])
+                         for i in range(geo.cells) if before.cand[i] & ~after.cand[i])
+    removed = 0
+    for _, mask in eliminations:
+        removed |= mask
+    digits = ", ".join(symbol(d) for d in solver.digits(removed, geo.side))
+    where = _where(eliminations[0][0], geo.side) if len(eliminations) == 1 else f"{len(eliminations)} cells"
+    # The eliminated cells and the ones that justify the step
+    cells = tuple(sorted({i for i, _ in eliminations}.union(after.because)))
+    return Hint(name, f"{name}: remove {digits} from {where}", cells, None, eliminations)
+
+
+def _next_step(grid):
+    # (name, grid after the simplest technique that applies), or None
+    for name, _, technique in TECHNIQUES:
+        trial = grid.copy()
+        if technique(trial):
+            return name, trial
+    return None
+
+
+def _follow(first, grid):
+    # Keep solving after the elimination `first` until a digit is placed;
+    # None if the techniques run out before that
+    names = [first.technique]
+    cells = set(first.cells)
+    eliminations = list(first.eliminations)
+    while True:
+        step = _next_step(grid)
+        if step is None:
+            return None
+        name, trial = step
+        hint = _describe(name, grid, trial)
+        if hint.placement is not None:
+            break
+        if name not in names:
+            names.append(name)
+        cells.update(hint.cells)
+        eliminations.extend(hint.eliminations)
+        grid = trial
+    order = [technique for technique, _, _ in TECHNIQUES]
+    hardest = max(names + [name], key=order.index)
+    message = f"{', '.join(names)}, then {hint.message}"
+    return Hint(hardest, message, tuple(sorted(cells.union(hint.cells))), hint.placement, tuple(eliminations))
+
+
+def _reveal(board, grid):
+    # No technique applies: offer the answer for the most constrained cell
+    geo = grid.geo
+    empty = [i for i in range(geo.cells) if not grid.cells[i]]
+    if not empty:
+        return None
+    solution = board.solution
+    if solution is None:
+        solution = solver.solve(board.to_grid())
+        if solution is None:
+            return None
+        solution = solver.to_flat(solution)
+    i = min(empty, key=lambda j: geo.popcount[grid.cand[j]])
+    message = f"No logical step found; {symbol(solution[i])} goes in {_where(i, geo.side)}"
+    return Hint(REVEAL, message, (i,), (i, solution[i]), ())
+
+
+def find_hint(board):
+    # The simplest justified next step on `board`, or None if it is solved
+    hint = _mistakes(board)
+    if hint is not None:
+        return hint
+
+    grid = _Grid(board.cells)
+    notes = board.notes
+    for i in range(board.geo.cells):
+        if notes[i] and not grid.cells[i]:
+            grid.cand[i] &= notes[i]
+
+    step = _next_step(grid)
+    if step is not None:
+        name, trial = step
+        hint = _describe(name, grid, trial)
+        if hint.placement is None:
+            hint = _follow(hint, trial)
+        if hint is not None:
+            return hint
+    return _reveal(board, grid)
+
+
+class HintEngine:
+    # request() returns a cached hint at once, or queues the search on a
+    # worker thread and returns None; on_ready() is called from that thread
+    # when the result lands in the cache. An inline engine searches in
+    # request() itself, so hints land on the same frame in every run.
+    def __init__(self, on_ready=None, inline=False):
+        self.on_ready = on_ready
+        self.inline = inline
+        self.cache = {}
+        self.pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def request(self, board):
+        key = board.key()
+        with self._lock:
+            if key in self.cache:
+                return self.cache[key]
+            if key in self.pending:
+                return None
+            if self.inline:
+                hint = self.cache[key] = find_hint(board)
+                return hint
+            self.pending.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hints")
+        future = self._executor.submit(find_hint, board.copy())
+        future.add_done_callback(lambda f, key=key: self._done(key, f))
+        return None
+
+    def get(self, board):
+        return self.cache.get(board.key())
+
+    def _done(self, key, future):
+        with self._lock:
+            self.pending.discard(key)
+            if future.cancelled() or future.exception() is not None:
+                return
+            if len(self.cache) >= HINT_CACHE_LIMIT:
+                self.cache.clear()
+            self.cache[key] = future.result()
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
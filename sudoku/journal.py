@@ -0,0 +1,111 @@
+"""Append-only move journal with O(1) undo/redo and its binary encodings.
+
+Each entry is a delta (kind, cell, old value, new value, old notes, new
+notes), so stepping back or forward touches a single cell and never copies
+the board. Checkpoints bundle the board, the journal and game metadata;
+log records describe the moves made since the last checkpoint.
+"""
+import struct
+
+from .board import Board
+
+# Entry kinds
+PLACE, ERASE, NOTE, HINT = range(4)
+
+# Log operations
+OP_RECORD, OP_UNDO, OP_REDO = range(3)
+
+# Wide enough for 625 cells and 25-digit note masks
+ENTRY = struct.Struct("<BHBBII")
+LOG_RECORD = struct.Struct("<B" + ENTRY.format[1:] + "I")
+CHECKPOINT_HEADER = struct.Struct("<4sBIBBIIIH")
+CHECKPOINT_MAGIC = b"SDKS"
+VERSION = 2
+
+
+def _set_cell(board, cell, value, notes):
+    row, col = divmod(cell, board.geo.side)
+    if value:
+        board.place(row, col, value)
+    else:
+        board.erase(row, col)
+    board.set_notes(row, col, notes)
+
+
+class Journal:
+    def __init__(self, entries=None, cursor=None):
+        self.entries = list(entries or [])
+        self.cursor = len(self.entries) if cursor is None else cursor
+
+    def record(self, kind, cell, old, new, old_notes, new_notes):
+        # A new move drops anything that could have been redone
+        del self.entries[self.cursor:]
+        entry = (kind, cell, old, new, old_notes, new_notes)
+        self.entries.append(entry)
+        self.cursor += 1
+        return entry
+
+    def can_undo(self):
+        return self.cursor > 0
+
+    def can_redo(self):
+        return self.cursor < len(self.entries)
+
+    def undo(self, board):
+        if not self.can_undo():
+            return None
+        self.cursor -= 1
+        entry = self.entries[self.cursor]
+        _set_cell(board, entry[1], entry[2], entry[4])
+        return entry
+
+    def redo(self, board):
+        if not self.can_redo():
+            return None
+        entry = self.entries[self.cursor]
+        self.cursor += 1
+        _set_cell(board, entry[1], entry[3], entry[5])
+        return entry
+
+    def replay(self, op, entry, board):
+        # Re-apply a logged operation when resuming a session
+        if op == OP_RECORD:
+            self.record(*entry)
+            _set_cell(board, entry[1], entry[3], entry[5])
+        elif op == OP_UNDO:
+            self.undo(board)
+        elif op == OP_REDO:
+            self.redo(board)
+
+
+def encode_log(op, entry, elapsed):
+    # `elapsed` is the game time in seconds, stored in tenths
+    return LOG_RECORD.pack(op, *(entry or (0, 0, 0, 0, 0, 0)), int(elapsed * 10))
+
+
+def decode_log(data):
+    records = []
+    for offset in range(0, len(data) - LOG_RECORD.size + 1, LOG_RECORD.size):
+        op, *entry, elapsed = LOG_RECORD.unpack_from(data, offset)
+        records.append((op, tuple(entry), elapsed / 10))
+    return records
+
+
+def encode_checkpoint(seq, board, journal, difficulty, hints, elapsed):
+    state = board.to_bytes()
+    header = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, VERSION, seq, difficulty, hints,
+                                    int(elapsed * 10), journal.cursor, len(journal.entries), len(state))
+    return header + state + b"".join(ENTRY.pack(*entry) for entry in journal.entries)
+
+
+def decode_checkpoint(data):
+    # Returns (seq, board, journal, difficulty, hints, elapsed)
+    magic, version, seq, difficulty, hints, elapsed, cursor, count, state_len = \
+        CHECKPOINT_HEADER.unpack_from(data, 0)
+    if magic != CHECKPOINT_MAGIC or version != VERSION:
+        raise ValueError("not a session checkpoint")
+    offset = CHECKPOINT_HEADER.size
+    board = Board.from_bytes(data[offset:offset + state_len])
+    offset += state_len
+    entries = [ENTRY.unpack_from(data, offset + k * ENTRY.size) for k in range(count)]
+    return seq, board, Journal(entries, cursor), difficulty, hints, elapsed / 10
@@ -0,0 +1,133 @@
+"""Per-difficulty pool of ready puzzles, refilled by a background process.
+
+Every puzzle handed out is recorded by its hash (canonical.dedup_hash), and
+later puzzles equivalent to one of them are skipped; above 9x9 only exact
+repeats are. With a seed, the n-th puzzle of each level is generated from
+its own RNG, so a seeded pool deals the same sequence whatever the timing
+of its workers.
+"""
+import random
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import solver
+from .canonical import dedup_hash
+from .generator import CELLS_TO_REMOVE, generate_board
+
+# Duplicates in a row after which take() settles for a repeat and refills
+# stop for the level; small boards only have so many different puzzles
+MAX_DUPLICATES = 20
+
+
+def _generate(level, base, seed=None):
+    # Worker task: a puzzle, its solution and its hash
+    rng = random if seed is None else random.Random(seed)
+    board, solution = generate_board(level, rng, base)
+    return board, solution, dedup_hash(board)
+
+
+class PuzzlePool:
+    def __init__(self, size=3, workers=1, levels=None, base=solver.BASE, seen=None, seed=None):
+        # `seen` is a set of puzzle hashes, which may be shared with other
+        # puzzle sources
+        self.size = size
+        self.base = base
+        self.seen = set() if seen is None else seen
+        self.seed = seed
+        self.workers = workers
+        self.levels = list(CELLS_TO_REMOVE) if levels is None else list(levels)
+        self.ready = {level: deque() for level in self.levels}
+        self.pending = {level: 0 for level in self.levels}
+        self.duplicates = {level: 0 for level in self.levels}
+        self.issued = {level: 0 for level in self.levels}  # Sequence numbers handed to workers
+        self.taken = {level: 0 for level in self.levels}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        for level in self.levels:
+            self._refill(level)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def take(self, level):
+        # O(1) when a new puzzle is ready; generates synchronously otherwise
+        for _ in range(MAX_DUPLICATES):
+            board, solution, key = self._next(level)
+            if key not in self.seen:
+                break
+        self.seen.add(key)
+        self._refill(level)
+        return board, solution
+
+    def _next(self, level):
+        ready = self.ready[level]
+        if self.seed is None:
+            try:
+                return ready.popleft()[1:]
+            except IndexError:
+                return _generate(level, self.base)
+
+        # Seeded: the puzzle due next, generated here if no worker has
+        # delivered it yet; anything older is dropped
+        with self.lock:
+            index = self.taken[level]
+            self.taken[level] += 1
+            self.issued[level] = max(self.issued[level], index + 1)
+            due = [entry for entry in ready if entry[0] == index]
+            later = [entry for entry in ready if entry[0] > index]
+            ready.clear()
+            ready.extend(later)
+        if due:
+            return due[0][1:]
+        return _generate(level, self.base, self._seed(level, index))
+
+    def _seed(self, level, index):
+        if self.seed is None:
+            return None
+        return f"{self.seed}:{self.base}:{level}:{index}"
+
+    def available(self, level):
+        return len(self.ready[level])
+
+    def _refill(self, level):
+        if self.executor is None:
+            return
+        with self.lock:
+            missing = self.size - len(self.ready[level]) - self.pending[level]
+            if missing <= 0:
+                return
+            self.pending[level] += missing
+            first = self.issued[level]
+            self.issued[level] += missing
+        for index in range(first, first + missing):
+            try:
+                future = self.executor.submit(_generate, level, self.base, self._seed(level, index))
+            except RuntimeError:
+                # Executor shut down or broken: stop refilling
+                with self.lock:
+                    self.pending[level] = 0
+                return
+            future.add_done_callback(lambda f, level=level, index=index: self._done(level, index, f))
+
+    def _done(self, level, index, future):
+        with self.lock:
+            self.pending[level] -= 1
+        if future.cancelled() or future.exception() is not None:
+            return
+        if future.result()[2] in self.seen:
+            # Try again, unless the level looks used up
+            self.duplicates[level] += 1
+            if self.duplicates[level] < MAX_DUPLICATES:
+                self._refill(level)
+            return
+        self.duplicates[level] = 0
+        with self.lock:
+            if index >= self.taken[level] or self.seed is None:
+                self.ready[level].append((index, *future.result()))
@@ -0,0 +1,119 @@
+"""Per-phase frame profiler.
+
+The frame loop calls start_frame(), mark(phase) after each phase and
+end_frame(). While neither the overlay nor a log is active every call
+returns immediately, so the profiler can stay wired into the loop.
+"""
+import csv
+import json
+import statistics
+import time
+from collections import deque
+
+# Frames buffered before timings are written to the log file
+LOG_BATCH = 120
+
+
+class FrameProfiler:
+    def __init__(self, history=240):
+        self.enabled = False
+        self.collecting = False
+        self.active = False
+        self.frames = deque(maxlen=history)  # (total ms, wait ms, {phase: ms})
+        self.log_file = None
+        self.log_format = None
+        self.log_writer = None
+        self.log_buffer = []
+        self.frame_index = 0
+        self._start = self._last = 0.0
+        self._phases = {}
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._update_active()
+        if not self.enabled and not self.collecting:
+            self.frames.clear()
+
+    def collect(self):
+        # Keep every frame for summary() without showing the overlay
+        self.collecting = True
+        self.frames = deque(self.frames)
+        self._update_active()
+
+    def _update_active(self):
+        self.active = self.enabled or self.collecting or self.log_file is not None
+
+    def open_log(self, path):
+        # Stream per-frame timings as CSV or, for .jsonl paths, JSON lines
+        self.log_file = open(path, "w", newline="")
+        self.log_format = "jsonl" if path.endswith(".jsonl") else "csv"
+        if self.log_format == "csv":
+            self.log_writer = csv.writer(self.log_file)
+            self.log_writer.writerow(["frame", "total_ms", "phase", "ms"])
+        self._update_active()
+
+    def close(self):
+        if self.log_file is not None:
+            self._flush()
+            self.log_file.close()
+            self.log_file = None
+            self._update_active()
+
+    def start_frame(self):
+        if not self.active:
+            return
+        self._start = self._last = time.perf_counter()
+        self._phases = {}
+
+    def mark(self, phase):
+        # Charge the time since the previous mark to `phase`
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def end_frame(self):
+        if not self.active:
+            return
+        total = (time.perf_counter() - self._start) * 1000
+        self.frame_index += 1
+        if self.enabled or self.collecting:
+            self.frames.append((total, self._phases.get("wait", 0.0), self._phases))
+        if self.log_file is not None:
+            self.log_buffer.append((self.frame_index, total, self._phases))
+            if len(self.log_buffer) >= LOG_BATCH:
+                self._flush()
+
+    def _flush(self):
+        for index, total, phases in self.log_buffer:
+            if self.log_format == "jsonl":
+                self.log_file.write(json.dumps({"frame": index, "total_ms": round(total, 4),
+                                                "phases": {k: round(v, 4) for k, v in phases.items()}}) + "\n")
+            else:
+                for phase, ms in phases.items():
+                    self.log_writer.writerow([index, f"{total:.4f}", phase, f"{ms:.4f}"])
+        self.log_buffer.clear()
+
+    def summary(self):
+        # FPS over the recorded window, percentiles of the frame work (time
+        # outside the scheduler wait) and the mean time spent in each phase
+        if len(self.frames) < 2:
+            return None
+        totals = [total for total, _, _ in self.frames]
+        work = [total - wait for total, wait, _ in self.frames]
+        cuts = statistics.quantiles(work, n=100, method="inclusive")
+        phases = {}
+        for _, _, frame_phases in self.frames:
+            for phase, ms in frame_phases.items():
+                phases[phase] = phases.get(phase, 0.0) + ms
+        count = len(self.frames)
+        return {
+            "frames": count,
+            "fps": 1000 * count / sum(totals) if sum(totals) else 0.0,
+            "p50": cuts[49],
+            "p95": cuts[94],
+            "p99": cuts[98],
+            "max": max(work),
+            "phases": {phase: ms / count for phase, ms in phases.items()},
+        }
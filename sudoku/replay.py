@@ -0,0 +1,61 @@
+"""Compact input recordings, for replaying a session as a repeatable test.
+
+A recording is a header (magic, version, board base, RNG seed) followed by
+fixed-size event records: frame number, milliseconds since recording
+started, event kind and three integer fields (key and modifiers for keys,
+position and button for mouse events). Replaying the events into the
+frames they arrived in, with the same seed, gives the same game. Nothing
+here imports pygame; main.py translates its events to and from records.
+"""
+import struct
+import time
+
+MAGIC = b"SDKI"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBBQ")
+EVENT = struct.Struct("<IIBIHH")
+
+# Event kinds
+KEY, CLICK, MOTION = range(3)
+
+# Bytes buffered before the recorder writes to disk
+FLUSH_SIZE = 1 << 12
+
+
+class Recorder:
+    def __init__(self, path, base, seed):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, base, seed))
+        self.buffer = bytearray()
+        self.count = 0
+        self._start = time.perf_counter()
+
+    def record(self, frame, kind, a=0, b=0, c=0):
+        ms = int((time.perf_counter() - self._start) * 1000)
+        self.buffer += EVENT.pack(frame, ms, kind, a, b, c)
+        self.count += 1
+        if len(self.buffer) >= FLUSH_SIZE:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+            self.file.close()
+            self.file = None
+
+
+def read_recording(path):
+    # Returns (base, seed, events), events as (frame, ms, kind, a, b, c)
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not an input recording")
+    magic, version, base, seed = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not an input recording")
+    body = memoryview(data)[HEADER.size:]
+    body = body[:len(body) - len(body) % EVENT.size]
+    return base, seed, list(EVENT.iter_unpack(body))
@@ -0,0 +1,130 @@
+"""Save/resume store for the game in progress.
+
+A session is two files: a checkpoint (see journal.encode_checkpoint), replaced
+atomically, and a log of the moves made since then, both written on a
+writer.BackgroundWriter. The log starts with the checkpoint's sequence
+number; a log left over from an older checkpoint is ignored on load.
+"""
+import os
+import struct
+
+from .journal import HINT, OP_RECORD, decode_checkpoint, decode_log, encode_checkpoint, encode_log
+from .writer import BackgroundWriter
+
+CHECKPOINT_NAME = "session.ckpt"
+LOG_NAME = "session.log"
+LOG_HEADER = struct.Struct("<4sI")
+LOG_MAGIC = b"SDKL"
+
+# Moves logged before the game asks for a fresh checkpoint
+CHECKPOINT_EVERY = 64
+
+
+class SessionStore:
+    # A store without a directory encodes everything as usual but writes
+    # nothing, e.g. for replays that must not touch the player's save
+    def __init__(self, directory):
+        self.directory = directory
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_NAME) if directory else None
+        self.log_path = os.path.join(directory, LOG_NAME) if directory else None
+        self.seq = 0
+        self.pending = 0  # Moves logged since the last checkpoint
+        self._writer = BackgroundWriter("session-writer", self._write, failed=self._close_log,
+                                        closed=self._close_log)
+        self._log = None
+
+    def start(self):
+        self._writer.start()
+
+    def checkpoint(self, board, journal, difficulty, hints, elapsed):
+        # Snapshot the whole game; the encoding happens here so the writer
+        # thread never touches live game objects
+        self.seq += 1
+        self.pending = 0
+        data = encode_checkpoint(self.seq, board, journal, difficulty, hints, elapsed)
+        self._put(("checkpoint", self.seq, data))
+
+    def log(self, op, entry, elapsed):
+        self.pending += 1
+        self._put(("log", encode_log(op, entry, elapsed)))
+
+    def needs_checkpoint(self):
+        return self.pending >= CHECKPOINT_EVERY
+
+    def clear(self):
+        self.pending = 0
+        self._put(("clear",))
+
+    def close(self):
+        # Flush everything queued so far and stop the writer
+        self._writer.close()
+
+    def _put(self, item):
+        if self.directory is None:
+            return
+        self._writer.put(item)
+
+    def _write(self, batch):
+        chunks = []
+        for item in batch:
+            kind = item[0]
+            if kind == "log":
+                chunks.append(item[1])
+                continue
+            self._flush(chunks)
+            if kind == "checkpoint":
+                self._write_checkpoint(item[1], item[2])
+            else:
+                self._remove()
+        self._flush(chunks)
+
+    def _flush(self, chunks):
+        if chunks and self._log is not None:
+            self._log.write(b"".join(chunks))
+            self._log.flush()
+        chunks.clear()
+
+    def _write_checkpoint(self, seq, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.checkpoint_path)
+        self._close_log()
+        self._log = open(self.log_path, "wb")
+        self._log.write(LOG_HEADER.pack(LOG_MAGIC, seq))
+        self._log.flush()
+
+    def _remove(self):
+        self._close_log()
+        for path in (self.checkpoint_path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _close_log(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def load_session(directory):
+    # Rebuild the saved game: (board, journal, difficulty, hints, elapsed),
+    # or None if there is no usable checkpoint
+    try:
+        with open(os.path.join(directory, CHECKPOINT_NAME), "rb") as f:
+            seq, board, journal, difficulty, hints, elapsed = decode_checkpoint(f.read())
+    except (OSError, ValueError, struct.error):
+        return None
+
+    try:
+        with open(os.path.join(directory, LOG_NAME), "rb") as f:
+            data = f.read()
+    except OSError:
+        data = b""
+    if len(data) >= LOG_HEADER.size and LOG_HEADER.unpack_from(data) == (LOG_MAGIC, seq):
+        # Each move carries the game time, so the last one wins
+        for op, entry, elapsed in decode_log(data[LOG_HEADER.size:]):
+            journal.replay(op, entry, board)
+            if op == OP_RECORD and entry[0] == HINT:
+                hints -= 1
+    return board, journal, difficulty, hints, elapsed
@@ -0,0 +1,278 @@
+"""Bitmask constraint-propagation Sudoku solver.
+
+Boards are square lists of lists of ints with 0 for empty cells: 9x9 by
+default, or any BASE^2 x BASE^2 size for BASE 2-5. Internally the grid is a
+flat list of cells and every row, column and box keeps a bitmask of the
+digits already placed in it. The lookup tables for each size live in a
+Geometry, built once per base; the module-level names describe the classic
+9x9 board. This module never imports pygame.
+"""
+import math
+import random
+
+MIN_BASE, MAX_BASE = 2, 5
+
+
+class _PopCount:
+    # Stand-in for a popcount table when 2^SIDE entries would be too many
+    def __getitem__(self, mask):
+        return bin(mask).count("1")
+
+
+class Geometry:
+    # Lookup tables for a BASE^2 x BASE^2 board
+    def __init__(self, base):
+        if not MIN_BASE <= base <= MAX_BASE:
+            raise ValueError(f"base must be between {MIN_BASE} and {MAX_BASE}, got {base}")
+        side = base * base
+        cells = side * side
+        self.base = base
+        self.side = side
+        self.cells = cells
+        self.all = (1 << side) - 1
+        self.row = [i // side for i in range(cells)]
+        self.col = [i % side for i in range(cells)]
+        self.box = [(i // side // base) * base + (i % side) // base for i in range(cells)]
+        self.units = (
+            [[r * side + c for c in range(side)] for r in range(side)] +
+            [[r * side + c for r in range(side)] for c in range(side)] +
+            [[(b // base * base + k // base) * side + b % base * base + k % base for k in range(side)]
+             for b in range(side)]
+        )
+        self.peers = [
+            sorted({j for unit in (self.units[self.row[i]], self.units[side + self.col[i]],
+                                   self.units[2 * side + self.box[i]]) for j in unit} - {i})
+            for i in range(cells)
+        ]
+        # Unit indexes of each cell: rows, then columns, then boxes
+        self.cell_units = [(self.row[i], side + self.col[i], 2 * side + self.box[i]) for i in range(cells)]
+        self.bit = {1 << d: d + 1 for d in range(side)}
+        self.popcount = [bin(m).count("1") for m in range(self.all + 1)] if side <= 16 else _PopCount()
+
+
+_GEOMETRIES = {}
+
+
+def geometry(base=3):
+    g = _GEOMETRIES.get(base)
+    if g is None:
+        g = _GEOMETRIES[base] = Geometry(base)
+    return g
+
+
+def geometry_for(side):
+    # Geometry of a grid with `side` rows
+    base = math.isqrt(side)
+    if base * base != side:
+        raise ValueError(f"no Sudoku geometry with side {side}")
+    return geometry(base)
+
+
+# The classic 9x9 board
+GEOMETRY = geometry(3)
+BASE = GEOMETRY.base
+SIDE = GEOMETRY.side
+CELLS = GEOMETRY.cells
+ALL = GEOMETRY.all
+ROW = GEOMETRY.row
+COL = GEOMETRY.col
+BOX = GEOMETRY.box
+UNITS = GEOMETRY.units
+BIT = GEOMETRY.bit
+POPCOUNT = GEOMETRY.popcount
+
+
+# How digits are written: 1-9, then letters on boards with more than nine
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+
+
+def symbol(d):
+    return SYMBOLS[d - 1]
+
+
+def digits(mask, side=SIDE):
+    # Digits (1-based) set in a candidate mask
+    return [d + 1 for d in range(side) if mask >> d & 1]
+
+
+def to_flat(grid):
+    return [v for row in grid for v in row]
+
+
+def to_grid(cells):
+    side = math.isqrt(len(cells))
+    return [list(cells[r * side:(r + 1) * side]) for r in range(side)]
+
+
+class _State:
+    __slots__ = ("cells", "rows", "cols", "boxes", "geo")
+
+    def __init__(self, cells, rows, cols, boxes, geo):
+        self.cells = cells
+        self.rows = rows
+        self.cols = cols
+        self.boxes = boxes
+        self.geo = geo
+
+    def copy(self):
+        return _State(self.cells[:], self.rows[:], self.cols[:], self.boxes[:], self.geo)
+
+    def place(self, i, bit):
+        geo = self.geo
+        self.cells[i] = geo.bit[bit]
+        self.rows[geo.row[i]] |= bit
+        self.cols[geo.col[i]] |= bit
+        self.boxes[geo.box[i]] |= bit
+
+    def candidates(self, i):
+        geo = self.geo
+        return geo.all & ~(self.rows[geo.row[i]] | self.cols[geo.col[i]] | self.boxes[geo.box[i]])
+
+
+def _initial_state(cells, geo=GEOMETRY):
+    side = geo.side
+    ROW, COL, BOX = geo.row, geo.col, geo.box
+    state = _State(list(cells), [0] * side, [0] * side, [0] * side, geo)
+    for i, v in enumerate(cells):
+        if v:
+            if not 0 < v <= side:
+                return None  # Not a digit of this board
+            bit = 1 << (v - 1)
+            if (state.rows[ROW[i]] | state.cols[COL[i]] | state.boxes[BOX[i]]) & bit:
+                return None  # Givens already clash
+            state.place(i, bit)
+    return state
+
+
+def _propagate(state):
+    # Apply naked and hidden singles until nothing changes. Returns the
+    # candidate mask of every empty cell, or None on contradiction.
+    cells, rows, cols, boxes = state.cells, state.rows, state.cols, state.boxes
+    geo = state.geo
+    CELLS, ALL, ROW, COL, BOX, UNITS, BIT = geo.cells, geo.all, geo.row, geo.col, geo.box, geo.units, geo.bit
+    while True:
+        cand = [0] * CELLS
+        progress = False
+
+        # Naked singles
+        for i in range(CELLS):
+            if cells[i]:
+                continue
+            r, c, b = ROW[i], COL[i], BOX[i]
+            m = ALL & ~(rows[r] | cols[c] | boxes[b])
+            if not m:
+                return None
+            if m & (m - 1) == 0:
+                cells[i] = BIT[m]
+                rows[r] |= m
+                cols[c] |= m
+                boxes[b] |= m
+                progress = True
+            else:
+                cand[i] = m
+        if progress:
+            continue
+
+        # Hidden singles. Placing one makes later masks in this pass stale,
+        # so every placement is re-checked against the live unit masks.
+        for unit in UNITS:
+            once = twice = placed = 0
+            for i in unit:
+                v = cells[i]
+                if v:
+                    placed |= 1 << (v - 1)
+                else:
+                    m = cand[i]
+                    twice |= once & m
+                    once |= m
+            if (once | placed) != ALL:
+                return None  # Some digit has nowhere to go
+            singles = once & ~twice & ~placed
+            if not singles:
+                continue
+            for i in unit:
+                hit = cand[i] & singles
+                if not hit or cells[i]:
+                    continue
+                if hit & (hit - 1):
+                    return None  # Two hidden singles in one cell
+                r, c, b = ROW[i], COL[i], BOX[i]
+                if (rows[r] | cols[c] | boxes[b]) & hit:
+                    continue
+                cells[i] = BIT[hit]
+                rows[r] |= hit
+                cols[c] |= hit
+                boxes[b] |= hit
+                progress = True
+
+        if not progress:
+            return cand
+
+
+def _search(state, limit, found, rng):
+    cand = _propagate(state)
+    if cand is None:
+        return
+
+    # Branch on the empty cell with the fewest candidates
+    geo = state.geo
+    POPCOUNT = geo.popcount
+    best = -1
+    best_count = geo.side + 1
+    for i in range(geo.cells):
+        m = cand[i]
+        if not m:
+            continue
+        count = POPCOUNT[m]
+        if count < best_count:
+            best, best_count = i, count
+            if count == 2:
+                break
+    if best < 0:
+        found.append(state.cells[:])
+        return
+
+    options = digits(cand[best], geo.side)
+    if rng is not None:
+        rng.shuffle(options)
+    for d in options:
+        branch = state.copy()
+        branch.place(best, 1 << (d - 1))
+        _search(branch, limit, found, rng)
+        if len(found) >= limit:
+            return
+
+
+def _run(grid, limit, rng=None):
+    state = _initial_state(to_flat(grid), geometry_for(len(grid)))
+    if state is None:
+        return []
+    found = []
+    _search(state, limit, found, rng)
+    return found
+
+
+def solve(grid):
+    # Return one solution as a grid, or None if the puzzle has none
+    found = _run(grid, 1)
+    return to_grid(found[0]) if found else None
+
+
+def count_solutions(grid, limit=2):
+    # Count solutions, stopping as soon as `limit` have been found
+    return len(_run(grid, limit))
+
+
+def random_solution(rng=random, base=BASE):
+    # A uniformly shuffled search over the empty grid yields a random full board
+    side = base * base
+    empty = [[0] * side for _ in range(side)]
+    return to_grid(_run(empty, 1, rng)[0])
+
+
+def is_solved(grid):
+    # True if the grid is completely filled and breaks no Sudoku rule
+    cells = to_flat(grid)
+    if 0 in cells:
+        return False
+    return _initial_state(cells, geometry_for(len(grid))) is not None
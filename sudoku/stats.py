@@ -0,0 +1,222 @@
+"""Finished-game statistics and played puzzles, kept in a local SQLite database.
+
+Every solved puzzle adds a row to `games`: board size, difficulty, solve
+time, hints used and the puzzle's hash (canonical.dedup_hash). The
+connection belongs to the thread of a writer.BackgroundWriter, which
+commits each batch in one transaction and then refreshes the best and
+median time of the levels it touched; level() returns the in-memory copy.
+
+Every puzzle dealt, finished or not, also adds its hash to `played`, which
+load_played() reads at startup so puzzles don't repeat across launches.
+
+Best and median never scan the history. The best time is the first entry
+of the (base, difficulty, seconds) index for a level. For the median,
+`times` counts a level's games per whole second and is updated with every
+insert: walking those counts finds the second that holds each middle game,
+and only that second's games are read from the index.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from . import solver
+from .canonical import dedup_hash
+from .writer import BackgroundWriter
+
+STATS_NAME = "stats.db"
+
+# games is the number of finished games; times are in seconds
+LevelStats = namedtuple("LevelStats", "games best median")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    base INTEGER NOT NULL,
+    difficulty INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    hints INTEGER NOT NULL,
+    puzzle INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_time ON games (base, difficulty, seconds);
+CREATE TABLE IF NOT EXISTS levels (
+    base INTEGER NOT NULL,
+    difficulty INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (base, difficulty)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS times (
+    base INTEGER NOT NULL,
+    difficulty INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (base, difficulty, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS played (
+    puzzle INTEGER PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def _signed(key):
+    # SQLite integers are signed 64-bit
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def _unsigned(key):
+    return key + (1 << 64) if key < 0 else key
+
+
+class StatsStore:
+    # With directory None, record() is a no-op and no database is opened.
+    # on_ready() is called from the writer thread whenever level() has new
+    # numbers.
+    def __init__(self, directory, on_ready=None):
+        self.directory = directory
+        self.path = os.path.join(directory, STATS_NAME) if directory else None
+        self.on_ready = on_ready
+        self._levels = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._writer = BackgroundWriter("stats-writer", self._write, errors=sqlite3.Error,
+                                        failed=self._rollback, opened=self._open, closed=self._close_db)
+
+    def start(self):
+        # Opens the database and loads the summary on the writer thread
+        if self.directory is not None:
+            self._writer.start()
+
+    def record(self, board, difficulty, seconds, hints):
+        # The givens are copied here so the writer never touches the live board
+        if self.directory is None:
+            return
+        puzzle = [v if g else 0 for v, g in zip(board.cells, board.given)]
+        self._writer.put(("game", time.time(), board.geo.base, difficulty, seconds, hints, puzzle))
+
+    def deal(self, key):
+        # Remember a puzzle hash (canonical.dedup_hash) as played
+        if self.directory is not None:
+            self._writer.put(("played", key))
+
+    def load_played(self):
+        # Hashes of every puzzle dealt in earlier runs; read once at startup,
+        # before the writer thread opens the database
+        if self.directory is None or not os.path.exists(self.path):
+            return set()
+        try:
+            db = sqlite3.connect(self.path)
+            try:
+                return {_unsigned(key) for key, in db.execute("SELECT puzzle FROM played")}
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return set()
+
+    def level(self, base, difficulty):
+        # LevelStats for a board size and difficulty, or None before the first game
+        with self._lock:
+            return self._levels.get((base, difficulty))
+
+    def close(self):
+        # Commit everything queued so far and stop the writer
+        self._writer.close()
+
+    def _open(self):
+        self._db = self._connect()
+
+    def _close_db(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _rollback(self):
+        self._db.rollback()
+
+    def _connect(self):
+        # The database with its schema in place and level() loaded, or None
+        db = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            db = sqlite3.connect(self.path)
+            db.executescript(SCHEMA)
+            if db.execute("SELECT 1 FROM times LIMIT 1").fetchone() is None:
+                # Databases from before `times` existed: count their games once
+                with db:
+                    db.execute("INSERT INTO times (base, difficulty, bucket, games) "
+                               "SELECT base, difficulty, CAST(seconds AS INTEGER), COUNT(*) FROM games "
+                               "GROUP BY base, difficulty, CAST(seconds AS INTEGER)")
+            self._refresh(db, db.execute("SELECT base, difficulty FROM levels").fetchall())
+        except (OSError, sqlite3.Error):
+            if db is not None:
+                db.close()
+            return None
+        return db
+
+    def _write(self, batch):
+        db = self._db
+        if db is None:
+            return
+        rows = []
+        counts = {}
+        buckets = {}
+        played = []
+        for item in batch:
+            if item[0] == "played":
+                played.append((_signed(item[1]),))
+                continue
+            _, finished, base, difficulty, seconds, hints, puzzle = item
+            key = dedup_hash(solver.to_grid(puzzle))
+            rows.append((finished, base, difficulty, seconds, hints, _signed(key)))
+            counts[base, difficulty] = counts.get((base, difficulty), 0) + 1
+            bucket = base, difficulty, int(seconds)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        with db:
+            db.executemany("INSERT OR IGNORE INTO played (puzzle) VALUES (?)", played)
+            db.executemany("INSERT INTO games (finished, base, difficulty, seconds, hints, puzzle) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            db.executemany("INSERT INTO levels (base, difficulty, games) VALUES (?, ?, ?) "
+                           "ON CONFLICT (base, difficulty) DO UPDATE SET games = games + excluded.games",
+                           [(base, difficulty, n) for (base, difficulty), n in counts.items()])
+            db.executemany("INSERT INTO times (base, difficulty, bucket, games) VALUES (?, ?, ?, ?) "
+                           "ON CONFLICT (base, difficulty, bucket) DO UPDATE SET games = games + excluded.games",
+                           [(*bucket, n) for bucket, n in buckets.items()])
+        # One refresh per level, however many games the batch held
+        self._refresh(db, list(counts))
+
+    def _refresh(self, db, keys):
+        if not keys:
+            return
+        fresh = {}
+        for base, difficulty in keys:
+            games = db.execute("SELECT games FROM levels WHERE base = ? AND difficulty = ?",
+                               (base, difficulty)).fetchone()[0]
+            best = db.execute("SELECT MIN(seconds) FROM games WHERE base = ? AND difficulty = ?",
+                              (base, difficulty)).fetchone()[0]
+            middle = self._middle(db, base, difficulty, games)
+            median = sum(middle) / len(middle) if middle else None
+            fresh[base, difficulty] = LevelStats(games, best, median)
+        with self._lock:
+            self._levels.update(fresh)
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def _middle(self, db, base, difficulty, games):
+        # The middle one or two times: the per-second counts lead to the
+        # bucket holding each middle rank, then the index is read inside it
+        ranks = sorted({(games - 1) // 2, games // 2})
+        middle = []
+        before = 0
+        for bucket, n in db.execute("SELECT bucket, games FROM times WHERE base = ? AND difficulty = ? "
+                                    "ORDER BY bucket", (base, difficulty)).fetchall():
+            while ranks and ranks[0] < before + n:
+                middle += [row[0] for row in db.execute(
+                    "SELECT seconds FROM games INDEXED BY games_by_time "
+                    "WHERE base = ? AND difficulty = ? AND seconds >= ? AND seconds < ? "
+                    "ORDER BY seconds LIMIT 1 OFFSET ?",
+                    (base, difficulty, bucket, bucket + 1, ranks.pop(0) - before))]
+            if not ranks:
+                break
+            before += n
+        return middle
@@ -0,0 +1,68 @@
+"""Background writer shared by the save and statistics stores.
+
+Callers put items on a queue, so the frame loop never waits on the disk.
+One daemon thread takes whatever has queued up since its last pass and
+hands it to write() as a single batch, so a burst of moves costs one flush
+or one transaction. close() writes everything put so far and stops the
+thread; the next put() starts a new one.
+"""
+import queue
+import threading
+
+STOP = None
+
+
+class BackgroundWriter:
+    # write(batch) runs on the writer thread. An exception listed in `errors`
+    # drops that batch and calls failed(); writing is best effort and the
+    # game keeps running without it. opened() and closed() run on the
+    # writer thread around its first and last batch, for resources that
+    # belong to that thread.
+    def __init__(self, name, write, errors=(OSError,), failed=None, opened=None, closed=None):
+        self.name = name
+        self.write = write
+        self.errors = errors
+        self.failed = failed
+        self.opened = opened
+        self.closed = closed
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def put(self, item):
+        self.start()
+        self._queue.put(item)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        if self.opened is not None:
+            self.opened()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if STOP in batch:
+                running = False
+                batch = batch[:batch.index(STOP)]
+            if not batch:
+                continue
+            try:
+                self.write(batch)
+            except self.errors:
+                if self.failed is not None:
+                    self.failed()
+        if self.closed is not None:
+            self.closed()